@@ -0,0 +1,197 @@
+'''
+Batch solves, for checking whole collections of puzzles at once
+(POST /solver/batch, and `manage.py solve_batch`).
+
+The input is JSON Lines, one puzzle per line:
+    {"puzzle_type": ..., "puzzle": ..., "id": ...}
+where "puzzle" is the same JSON that the browser sends (as a string or
+an object), "id" is optional and copied to the result, and a line may
+also set the solve options "mode", "max_solutions", "timeout_ms" and "profile".
+A puzzle without a "timeout_ms" gets the batch's default timeout (for
+POST /solver/batch, the SOLVER_TIMEOUT setting).
+
+The output is JSON Lines too, one result per puzzle, in the input order:
+    {"index": ..., "id": ..., "puzzle_type": ..., "status": 200,
+     "solutions": (as returned by the `solver` view), "cached": ..., "time_ms": ...}
+or, if the puzzle couldn't be solved, "status" and a "message":
+ - 400: the puzzle (or an option) is invalid
+ - 503: the pool had no room for it within SOLVER_QUEUE_TIMEOUT (other
+ requests are using it), so the batch moved on rather than wait its turn
+ - 504: its solve wasn't done shortly after its deadline, so it was cancelled
+ - 500: anything else went wrong
+"time_ms" is the time from reading the puzzle until its solve finished.
+'''
+import json
+import time
+from collections import deque
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from . import cache, metrics, workers
+
+def parse_record(line, timeout = None):
+    '''
+    Returns (puzzle_type, puzzle as a JSON string, SolveOptions) for a line of input,
+    with a timeout of `timeout` seconds if the line doesn't set "timeout_ms".
+    Raises ValueError if the line isn't a valid record.
+    '''
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError as err:
+        raise ValueError(f'Invalid JSON: {err}')
+    if not isinstance(record, dict) or 'puzzle_type' not in record or 'puzzle' not in record:
+        raise ValueError('Each line must be an object with "puzzle_type" and "puzzle".')
+    puzzle = record['puzzle']
+    if not isinstance(puzzle, str):
+        puzzle = json.dumps(puzzle)
+    if record.get('timeout_ms') in (None, '') and timeout is not None:
+        record['timeout_ms'] = round(1000 * timeout)
+    return record['puzzle_type'], puzzle, workers.SolveOptions.from_params(record)
+
+class BatchItem:
+    '''
+    A puzzle of a batch, from when it's read until its result is written.
+    '''
+    def __init__(self, index, line):
+        self.index = index
+        self.start = time.perf_counter()
+        self.end = None
+        self.result = {'index': index}
+        self.module = None
+        self.options = None
+        self.key = None
+        self.future = None
+        self.cancel_event = None
+        self.profile = None
+        try:
+            record = json.loads(line)
+            if isinstance(record, dict) and 'id' in record:
+                self.result['id'] = record['id']
+        except json.JSONDecodeError:
+            pass
+
+    def stop_clock(self, future = None):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    def fail(self, status, message):
+        self.result['status'] = status
+        self.result['message'] = message
+
+    def finish(self, solutions, truncated = False, cached = False):
+        self.result['status'] = 200
+        self.result['solutions'] = json.loads(workers.decode(self.module, solutions, self.options,
+            truncated, self.profile))
+        self.result['cached'] = cached
+
+    def outcome(self):
+        '''
+        Returns the outcome of the item's solve (see metrics.py).
+        '''
+        if self.result.get('status') == 400:
+            return 'invalid'
+        elif self.result.get('status') == 503:
+            return 'busy'
+        elif self.result.get('status') == 504:
+            return 'timeout'
+        elif self.result.get('status') != 200:
+            return 'error'
+        elif self.result['cached']:
+            return 'cached'
+        elif self.result['solutions'].get('truncated'):
+            return 'truncated'
+        return 'solved'
+
+    def to_json(self):
+        self.stop_clock()
+        self.result['time_ms'] = round(1000 * (self.end - self.start), 3)
+        metrics.observe_solve(self.result.get('puzzle_type'), self.outcome(), self.end - self.start)
+        return json.dumps(self.result)
+
+def submit(pool, item, line, timeout = None):
+    '''
+    Encodes an item's puzzle and answers it from the solution cache,
+    or queues it on the pool (waiting up to the pool's queue timeout for a free slot).
+    timeout = the default timeout of the item's solve, in seconds
+    '''
+    try:
+        puzzle_type, puzzle, item.options = parse_record(line, timeout)
+        item.result['puzzle_type'] = puzzle_type
+        item.module = workers.get_solver_module(puzzle_type)
+        puzzle_encoding, item.profile = workers.encode(item.module, puzzle, item.options)
+        item.key, solutions = cache.get_cache().lookup(puzzle_type, puzzle_encoding,
+            getattr(item.module, 'SYMMETRY', None), item.options.mode, item.options.max_solutions)
+        if solutions is not None:
+            if item.profile is not None:
+                item.profile.count('cache_hits')
+            item.finish(solutions, cached = True)
+            return
+        item.cancel_event = pool.cancel_event()
+        item.future = pool.submit(workers.run_solver, puzzle_type, puzzle_encoding,
+            item.options, item.cancel_event)
+        item.future.add_done_callback(item.stop_clock)
+    except workers.SolverBusy as err:
+        # other requests are using the pool; don't hold on to it waiting our turn
+        item.fail(503, str(err))
+    except ValueError as err:
+        item.fail(400, str(err))
+    except Exception as exc:
+        item.fail(500, str(exc))
+
+def collect(item):
+    '''
+    Waits for an item's solve to finish and records its result.
+    '''
+    if item.future is None:
+        return
+    deadline = item.options.deadline
+    try:
+        solutions, truncated, solve_profile = item.future.result(
+            None if deadline is None else max(0, deadline - time.time()) + workers.DEADLINE_GRACE)
+        if not truncated:
+            cache.get_cache().put(item.key, solutions)
+        if item.profile is not None:
+            item.profile.merge(solve_profile)
+        item.finish(solutions, truncated)
+    except FutureTimeout:
+        # stop the solve as soon as it checks, to free its slot
+        item.cancel_event.set()
+        item.future.cancel()
+        item.stop_clock()
+        item.fail(504, 'The puzzle took too long to solve.')
+    except ValueError as err:
+        item.fail(400, str(err))
+    except Exception as exc:
+        item.fail(500, str(exc))
+
+def solve_batch(pool, lines, timeout = None):
+    '''
+    Solves the puzzles in an iterable of lines of JSON (see the module docstring)
+    on a SolverPool, and yields a line of JSON with the result of each one,
+    in the input order, as soon as it (and every puzzle before it) is done.
+    timeout = the timeout, in seconds, of puzzles that don't set "timeout_ms"
+    (None for no limit)
+
+    Enough puzzles are kept queued to keep every worker busy, but no more,
+    so that the batch doesn't starve other requests; a puzzle is only
+    queued once there's room for it among the batch's own puzzles.
+    '''
+    in_flight = max(1, min(max(1, pool.size), pool.queue_limit))
+    pending = deque()
+    index = 0
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode()
+        if not line.strip():
+            continue
+        item = BatchItem(index, line)
+        index += 1
+        while len(pending) >= in_flight or (pending and pending[0].future is None):
+            done = pending.popleft()
+            collect(done)
+            yield done.to_json() + '\n'
+        submit(pool, item, line, timeout)
+        pending.append(item)
+    while pending:
+        item = pending.popleft()
+        collect(item)
+        yield item.to_json() + '\n'
@@ -0,0 +1,220 @@
+'''
+A cache of solved puzzles, keyed on a canonical form of the puzzle.
+
+The key is a hash of the puzzle type and the puzzle's Encoding (the output
+of the solver module's `encode`), rather than of the JSON the browser sent;
+so JSON key order, URL-quoting of clues, and anything that `encode` throws
+away (like 'puzzle_type' and 'properties') do not affect it.
+
+There are two tiers:
+ - an in-memory LRU, evicted by total size
+ - an optional on-disk SQLite table, shared by every process that points at
+ the same file, evicted least-recently-used first by total size
+
+Genres that are unchanged by rotations / reflections can also be answered
+from the solutions of a rotated / reflected copy of the puzzle (see lookup).
+'''
+import collections.abc
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from enum import Enum
+
+from django.conf import settings
+
+from solvers.utils.solutions import ALL_SOLUTIONS, MAX_SOLUTIONS_TO_FIND
+from solvers.utils.symmetry import IDENTITY, INVERSE_SYMMETRY
+
+def canonicalize(value):
+    '''
+    Converts a value from an Encoding into JSON-serializable data
+    that does not depend on dict / set iteration order.
+    '''
+    if isinstance(value, Enum):
+        return value.name
+    elif isinstance(value, dict):
+        return sorted(([canonicalize(k), canonicalize(v)] for k, v in value.items()), key = json.dumps)
+    elif isinstance(value, collections.abc.Set): # including utils.BorderPlanes
+        return sorted((canonicalize(v) for v in value), key = json.dumps)
+    elif isinstance(value, (list, tuple)):
+        return [canonicalize(v) for v in value]
+    else:
+        return value
+
+def canonical_key(puzzle_type, E, mode = ALL_SOLUTIONS, max_solutions = MAX_SOLUTIONS_TO_FIND):
+    '''
+    Returns the cache key of a puzzle, given its type, its Encoding,
+    and the solve mode and solution limit (see utils.solutions)
+    that its solutions were found with.
+    '''
+    canonical_form = [puzzle_type, E.R, E.C] + [canonicalize(x) for x in
+        (E.clues, E.params, E.edges, E.top, E.right, E.bottom, E.left)]
+    if mode != ALL_SOLUTIONS:
+        canonical_form.append(mode)
+    elif max_solutions != MAX_SOLUTIONS_TO_FIND:
+        canonical_form.append(max_solutions)
+    return hashlib.sha256(json.dumps(canonical_form).encode()).hexdigest()
+
+class SolutionCache:
+    '''
+    Maps cache keys (see canonical_key) to lists of solutions.
+    '''
+    def __init__(self, max_bytes, db_path = None, db_max_bytes = None):
+        '''
+        max_bytes = max total size of the in-memory tier (0 disables it)
+        db_path = path to the SQLite database of the on-disk tier (None disables it)
+        db_max_bytes = max total size of the on-disk tier
+        '''
+        self.__max_bytes = max_bytes
+        self.__bytes = 0
+        self.__entries = OrderedDict() # key -> solutions as a JSON string
+        self.__db_path = db_path
+        self.__db_max_bytes = db_max_bytes
+        self.__db = None
+        self.__lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.symmetry_hits = 0 # hits (also counted above) on a rotated / reflected puzzle
+        self.misses = 0
+
+    def __connect(self):
+        if self.__db is None:
+            self.__db = sqlite3.connect(self.__db_path, check_same_thread = False, isolation_level = None)
+            self.__db.execute('CREATE TABLE IF NOT EXISTS noq_solution_cache ('
+                'key TEXT PRIMARY KEY, solutions TEXT NOT NULL, '
+                'size INTEGER NOT NULL, last_used REAL NOT NULL)')
+            self.__db.execute('CREATE INDEX IF NOT EXISTS noq_solution_cache_last_used '
+                'ON noq_solution_cache (last_used)')
+        return self.__db
+
+    def __remember(self, key, value):
+        '''
+        Puts a value into the in-memory tier, evicting old entries as needed.
+        '''
+        if len(value) > self.__max_bytes:
+            return
+        if key in self.__entries:
+            self.__bytes -= len(self.__entries.pop(key))
+        self.__entries[key] = value
+        self.__bytes += len(value)
+        while self.__bytes > self.__max_bytes:
+            old_key, old_value = self.__entries.popitem(last = False)
+            self.__bytes -= len(old_value)
+
+    def __get(self, key):
+        '''
+        Returns the cached list of solutions for a key (or None),
+        and the tier it was found in. Doesn't update the counters.
+        '''
+        if key in self.__entries:
+            self.__entries.move_to_end(key)
+            return json.loads(self.__entries[key]), 'memory'
+        if self.__db_path:
+            db = self.__connect()
+            row = db.execute('SELECT solutions FROM noq_solution_cache WHERE key = ?', (key,)).fetchone()
+            if row:
+                db.execute('UPDATE noq_solution_cache SET last_used = ? WHERE key = ?', (time.time(), key))
+                self.__remember(key, row[0])
+                return json.loads(row[0]), 'disk'
+        return None, None
+
+    def __count(self, tier):
+        if tier == 'memory':
+            self.memory_hits += 1
+        elif tier == 'disk':
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+
+    def get(self, key):
+        '''
+        Returns the cached list of solutions for a key, or None if there isn't one.
+        '''
+        with self.__lock:
+            solutions, tier = self.__get(key)
+            self.__count(tier)
+            return solutions
+
+    def lookup(self, puzzle_type, E, genre_symmetry = None,
+            mode = ALL_SOLUTIONS, max_solutions = MAX_SOLUTIONS_TO_FIND):
+        '''
+        Looks up a puzzle, given its type, Encoding, solve mode and solution limit.
+        If the genre declares symmetries (see solvers/utils/symmetry.py), a rotated /
+        reflected copy of the puzzle that has been solved before counts as a hit too,
+        and its solutions are transformed back to fit this puzzle.
+
+        Returns (the puzzle's cache key, the list of solutions or None).
+        '''
+        key = canonical_key(puzzle_type, E, mode, max_solutions)
+        with self.__lock:
+            solutions, tier = self.__get(key)
+            if solutions is None and genre_symmetry is not None:
+                for symmetry in genre_symmetry.symmetries:
+                    if symmetry == IDENTITY:
+                        continue
+                    transformed = genre_symmetry.transform_encoding(E, symmetry)
+                    solutions, tier = self.__get(canonical_key(puzzle_type, transformed, mode, max_solutions))
+                    if solutions is not None:
+                        inverse = INVERSE_SYMMETRY[symmetry]
+                        solutions = [genre_symmetry.transform_solution(solution, transformed.R, transformed.C, inverse)
+                            for solution in solutions]
+                        self.__remember(key, json.dumps(solutions))
+                        self.symmetry_hits += 1
+                        break
+            self.__count(tier)
+            return key, solutions
+
+    def put(self, key, solutions):
+        '''
+        Caches the list of solutions for a key.
+        '''
+        value = json.dumps(solutions)
+        with self.__lock:
+            self.__remember(key, value)
+            if self.__db_path:
+                db = self.__connect()
+                db.execute('INSERT OR REPLACE INTO noq_solution_cache VALUES (?, ?, ?, ?)',
+                    (key, value, len(value), time.time()))
+                total, = db.execute('SELECT COALESCE(SUM(size), 0) FROM noq_solution_cache').fetchone()
+                if total > self.__db_max_bytes:
+                    # delete the least recently used entries until we fit again
+                    excess = total - self.__db_max_bytes
+                    for old_key, size in db.execute('SELECT key, size FROM noq_solution_cache '
+                            'ORDER BY last_used').fetchall():
+                        if excess <= 0:
+                            break
+                        db.execute('DELETE FROM noq_solution_cache WHERE key = ?', (old_key,))
+                        excess -= size
+
+    def stats(self):
+        '''
+        Returns a dictionary of hit / miss counters and tier sizes.
+        '''
+        with self.__lock:
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'symmetry_hits': self.symmetry_hits,
+                'misses': self.misses,
+                'memory_entries': len(self.__entries),
+                'memory_bytes': self.__bytes,
+            }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    '''
+    Returns this process's solution cache, configured from the settings
+    (SOLUTION_CACHE_MAX_BYTES, SOLUTION_CACHE_DB, SOLUTION_CACHE_DB_MAX_BYTES).
+    '''
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SolutionCache(getattr(settings, 'SOLUTION_CACHE_MAX_BYTES', 32 * 2**20),
+                getattr(settings, 'SOLUTION_CACHE_DB', None),
+                getattr(settings, 'SOLUTION_CACHE_DB_MAX_BYTES', 256 * 2**20))
+        return _cache
@@ -0,0 +1,281 @@
+'''
+Asynchronous solve jobs.
+
+POST /solver/jobs queues a puzzle on the solver pool (see workers.py) and
+returns a job id straight away; GET /solver/jobs/<id> then reports the job's
+state along with the solutions found so far, and the final result once the
+solve has finished. This keeps slow puzzles off the request path.
+
+GET /solver/jobs/<id>/events streams the job's solutions as Server-Sent
+Events as soon as they are found (see JobStore.follow), and
+GET /solver/stream does the same for a new job. A stream holds its
+connection open, so it ends after SOLVER_TIMEOUT seconds (or at the job's
+deadline) even if the job isn't done.
+
+DELETE /solver/jobs/<id> cancels a job: a queued job never runs, and a
+running one stops (killing its clasp process) and finishes with the
+solutions it has found so far, marked as truncated.
+
+Jobs are kept in memory by the web process that created them, and are
+forgotten `ttl` seconds after they finish. Another web process doesn't
+know about them, so with several web processes, a job's requests must all
+reach the one that created it (which is why the solver pages only use jobs
+if the SOLVER_BROWSER_MODE setting says so).
+'''
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError
+
+from django.conf import settings
+
+from . import cache, metrics, workers
+
+# job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled' # cancelled before it started
+FINISHED = (DONE, FAILED, CANCELLED)
+
+class Job:
+    '''
+    The state of a single asynchronous solve.
+    '''
+    def __init__(self, puzzle_type, options):
+        self.id = uuid.uuid4().hex
+        self.puzzle_type = puzzle_type
+        self.options = options
+        self.state = QUEUED
+        self.solutions = [] # solutions found so far
+        self.result = None # the decoded solutions, once the job is done
+        self.error = None # (status code, message), if the job failed
+        self.submitted = time.time()
+        self.finished = None
+        self.future = None
+        self.cancel_event = None
+        self.timed_out = False # cancelled because its request's time ran out (see metrics.py)
+        self.profile = None # a Profile, if the options ask for one (see workers.encode)
+
+    def to_json(self):
+        '''
+        Returns the job's state as a JSON string.
+
+        'solutions' has the same format as the response of the `solver` view,
+        so it can be displayed the same way whether or not the job is done.
+        '''
+        job = {'id': self.id, 'puzzle_type': self.puzzle_type, 'mode': self.options.mode, 'state': self.state}
+        if self.state == DONE:
+            job['solutions'] = json.loads(self.result)
+        else:
+            job['solutions'] = {str(i+1): solution for i, solution in enumerate(self.solutions)}
+            job['solutions']['num_solutions'] = len(self.solutions)
+        if self.state == FAILED:
+            job['status'], job['message'] = self.error
+        return json.dumps(job)
+
+class JobStore:
+    '''
+    Keeps track of the jobs submitted to a solver pool.
+    '''
+    def __init__(self, pool, ttl):
+        '''
+        pool = the SolverPool to run jobs on
+        ttl = # seconds to keep a job around after it finishes
+        '''
+        self.__pool = pool
+        self.__ttl = ttl
+        self.__jobs = {}
+        self.__lock = threading.Condition() # notified whenever a job makes progress
+        self.__listener = None
+
+    def __listen(self, events):
+        '''
+        Records the progress events that workers report (runs in its own thread).
+        '''
+        while True:
+            job_id, event, data = events.get()
+            with self.__lock:
+                job = self.__jobs.get(job_id)
+                # events can arrive after the job's result, which already has everything
+                if job is None or job.state in FINISHED:
+                    continue
+                if event == 'started':
+                    job.state = RUNNING
+                elif event == 'solution':
+                    job.solutions.append(data)
+                self.__lock.notify_all()
+
+    def __events(self):
+        with self.__lock:
+            events = self.__pool.event_queue()
+            if self.__listener is None:
+                self.__listener = threading.Thread(target = self.__listen, args = (events,), daemon = True)
+                self.__listener.start()
+            return events
+
+    def __finish(self, job, module, key, future):
+        with self.__lock:
+            try:
+                solutions, truncated, solve_profile = future.result()
+                if not truncated:
+                    cache.get_cache().put(key, solutions)
+                if job.profile is not None:
+                    job.profile.merge(solve_profile)
+                job.result = workers.decode(module, solutions, job.options, truncated, job.profile)
+                job.state = DONE
+                outcome = ('timeout' if job.timed_out else 'truncated') if truncated else 'solved'
+            except CancelledError:
+                job.state = CANCELLED
+                outcome = 'timeout' if job.timed_out else 'truncated'
+            except ValueError as err:
+                job.error = (400, str(err))
+                job.state = FAILED
+                outcome = 'invalid'
+            except Exception as exc:
+                job.error = (500, str(exc))
+                job.state = FAILED
+                outcome = 'error'
+            job.finished = time.time()
+            self.__lock.notify_all()
+        metrics.observe_solve(job.puzzle_type, outcome, job.finished - job.submitted)
+
+    def __expire(self):
+        now = time.time()
+        for job_id in [job_id for job_id, job in self.__jobs.items()
+                if job.finished is not None and now - job.finished > self.__ttl]:
+            del self.__jobs[job_id]
+
+    def submit(self, puzzle_type, puzzle, options = None):
+        '''
+        Queues a puzzle (the JSON string from the browser) and returns its Job.
+        Puzzles in the solution cache are done straight away.
+        options = the workers.SolveOptions (None for the defaults)
+
+        Raises ValueError if the puzzle can't be encoded,
+        and workers.SolverBusy if the pool has no room for it.
+        '''
+        start = time.time()
+        try:
+            return self.__submit(puzzle_type, puzzle, options)
+        except workers.SolverBusy:
+            metrics.observe_solve(puzzle_type, 'busy', time.time() - start)
+            raise
+        except ValueError:
+            metrics.observe_solve(puzzle_type, 'invalid', time.time() - start)
+            raise
+        except Exception:
+            metrics.observe_solve(puzzle_type, 'error', time.time() - start)
+            raise
+
+    def __submit(self, puzzle_type, puzzle, options):
+        if options is None:
+            options = workers.SolveOptions()
+        job = Job(puzzle_type, options)
+        module = workers.get_solver_module(puzzle_type)
+        puzzle_encoding, job.profile = workers.encode(module, puzzle, options)
+        key, solutions = cache.get_cache().lookup(puzzle_type, puzzle_encoding,
+            getattr(module, 'SYMMETRY', None), options.mode, options.max_solutions)
+        with self.__lock:
+            self.__expire()
+            self.__jobs[job.id] = job
+            if solutions is not None:
+                if job.profile is not None:
+                    job.profile.count('cache_hits')
+                job.result = workers.decode(module, solutions, options, profile = job.profile)
+                job.state = DONE
+                job.finished = time.time()
+                metrics.observe_solve(puzzle_type, 'cached', job.finished - job.submitted)
+                return job
+        events = self.__events()
+        job.cancel_event = self.__pool.cancel_event()
+        try:
+            job.future = self.__pool.submit(workers.run_solver_job, puzzle_type, puzzle_encoding,
+                job.id, events, options, job.cancel_event)
+        except:
+            with self.__lock:
+                del self.__jobs[job.id]
+            raise
+        job.future.add_done_callback(lambda future: self.__finish(job, module, key, future))
+        return job
+
+    def cancel(self, job_id, timed_out = False):
+        '''
+        Cancels the job with the given id (see the module docstring), and returns it;
+        or returns None if there is no such job.
+        timed_out = True if it's cancelled because its request ran out of time
+        '''
+        job = self.get(job_id)
+        if job is not None and job.state not in FINISHED and job.future is not None:
+            job.timed_out = timed_out
+            job.cancel_event.set()
+            job.future.cancel()
+        return job
+
+    def follow(self, job, keepalive = 15, deadline = None):
+        '''
+        Yields (event, data) pairs as the job makes progress, until it's done
+        or until `deadline` (a time.time(), or None to wait as long as it takes):
+         - ('solution', solution) for every solution, as soon as it's found
+         - ('num_solutions', the rest of the result) once the job is done;
+         its 'num_solutions' is the final count (a uniqueness check may
+         have sent a second solution that isn't part of the result)
+         - ('error', {'status': ..., 'message': ...}) if the job failed or was cancelled
+         - ('keepalive', None) after `keepalive` seconds without progress
+         - ('timeout', None) if the deadline passes first (the job keeps going)
+        '''
+        sent = 0
+        while True:
+            wait = keepalive
+            if deadline is not None:
+                wait = max(0, min(wait, deadline - time.time()))
+            with self.__lock:
+                self.__lock.wait_for(lambda: len(job.solutions) > sent or job.state in FINISHED, wait)
+                solutions, state = list(job.solutions), job.state
+            if state == DONE:
+                result = json.loads(job.result)
+                for i in range(sent, result['num_solutions']):
+                    yield 'solution', result[str(i+1)]
+                yield 'num_solutions', {key: value for key, value in result.items() if not key.isdigit()}
+                return
+            elif state == FAILED:
+                status, message = job.error
+                yield 'error', {'status': status, 'message': message}
+                return
+            elif state == CANCELLED:
+                yield 'error', {'status': 409, 'message': 'The job was cancelled.'}
+                return
+            elif deadline is not None and time.time() >= deadline:
+                for solution in solutions[sent:]:
+                    yield 'solution', solution
+                yield 'timeout', None
+                return
+            elif len(solutions) > sent:
+                for solution in solutions[sent:]:
+                    yield 'solution', solution
+                sent = len(solutions)
+            else:
+                yield 'keepalive', None
+
+    def get(self, job_id):
+        '''
+        Returns the job with the given id, or None if there is no such job.
+        '''
+        with self.__lock:
+            self.__expire()
+            return self.__jobs.get(job_id)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    '''
+    Returns this process's job store (jobs run on workers.get_pool()).
+    '''
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = JobStore(workers.get_pool(), getattr(settings, 'SOLVER_JOB_TTL', 600))
+        return _store
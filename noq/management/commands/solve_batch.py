@@ -0,0 +1,45 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from noq import batch, workers
+
+class Command(BaseCommand):
+    help = ('Solves a JSON Lines file of puzzles ({"puzzle_type": ..., "puzzle": ...} per line) '
+        'and writes a JSON Lines result per puzzle (see noq/batch.py).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', nargs='?', default='-',
+            help='the file of puzzles to solve (default: standard input)')
+        parser.add_argument('-o', '--output', default='-',
+            help='the file to write results to (default: standard output)')
+        parser.add_argument('-w', '--workers', type=int, default=None,
+            help='# solver processes (default: the SOLVER_POOL_SIZE setting)')
+        parser.add_argument('-t', '--timeout', type=float, default=None,
+            help='# seconds each puzzle without a timeout_ms may take; 0 for no limit '
+                '(default: the SOLVER_TIMEOUT setting)')
+
+    def handle(self, *args, **options):
+        size = options['workers']
+        if size is None:
+            size = getattr(settings, 'SOLVER_POOL_SIZE', 1)
+        timeout = options['timeout']
+        if timeout is None:
+            timeout = getattr(settings, 'SOLVER_TIMEOUT', None)
+        # this process is the only one using the pool, so there's no need to time out
+        pool = workers.SolverPool(size, 2 * max(1, size), None, getattr(settings, 'SOLVER_WARM_UP', ()))
+        pool.warm_up()
+
+        input_file = sys.stdin if options['input'] == '-' else open(options['input'])
+        output_file = sys.stdout if options['output'] == '-' else open(options['output'], 'w')
+        try:
+            for result in batch.solve_batch(pool, input_file, timeout or None):
+                output_file.write(result)
+                output_file.flush()
+        finally:
+            pool.shutdown()
+            if input_file is not sys.stdin:
+                input_file.close()
+            if output_file is not sys.stdout:
+                output_file.close()
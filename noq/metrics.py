@@ -0,0 +1,163 @@
+'''
+Metrics of the solver service, in the Prometheus text format (GET /metrics).
+
+Every solve (through the `solver` view, a job, or a batch) is counted and
+timed by puzzle type and outcome:
+ - solved: solved by a worker
+ - cached: answered from the solution cache
+ - truncated: gave up early (it ran out of time, hit max_solutions' limit, or was cancelled),
+ and returned the solutions it found
+ - timeout: wasn't done shortly after its deadline, so it was cancelled and the
+ request got a 504 instead of its solutions (from the `solver` view or /solver/stream)
+ - invalid: the puzzle (or a request option) was rejected, i.e. a 400
+ - busy: the pool had no room for it, i.e. a 503
+ - error: anything else went wrong, i.e. a 500
+
+The counters live in the memory of the web process that serves the
+request, so with several web processes, each one reports its own
+(Prometheus adds them up).
+'''
+import threading
+
+# upper bounds (in seconds) of the buckets of the solve duration histogram
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def format_labels(labels):
+    '''
+    Formats a tuple of (name, value) pairs as Prometheus labels, e.g. {puzzle_type="lits"}.
+    '''
+    if not labels:
+        return ''
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels) + '}'
+
+class Counter:
+    '''
+    A count of events, for each combination of label values.
+    '''
+    def __init__(self, name, help_text, label_names = ()):
+        self.__name = name
+        self.__help = help_text
+        self.__label_names = tuple(label_names)
+        self.__values = {} # label values -> count
+        self.__lock = threading.Lock()
+    @property
+    def name(self):
+        return self.__name
+
+    def inc(self, *label_values, amount = 1):
+        with self.__lock:
+            self.__values[label_values] = self.__values.get(label_values, 0) + amount
+
+    def get(self, *label_values):
+        with self.__lock:
+            return self.__values.get(label_values, 0)
+
+    def render(self):
+        lines = [f'# HELP {self.__name} {self.__help}', f'# TYPE {self.__name} counter']
+        with self.__lock:
+            for label_values, value in sorted(self.__values.items()):
+                labels = format_labels(tuple(zip(self.__label_names, label_values)))
+                lines.append(f'{self.__name}{labels} {value}')
+        return lines
+
+class Histogram:
+    '''
+    A distribution of observed values (e.g. durations), for each combination of label values.
+    '''
+    def __init__(self, name, help_text, label_names = (), buckets = DURATION_BUCKETS):
+        self.__name = name
+        self.__help = help_text
+        self.__label_names = tuple(label_names)
+        self.__buckets = tuple(sorted(buckets))
+        self.__values = {} # label values -> [count per bucket (not cumulative) + the +Inf bucket, sum]
+        self.__lock = threading.Lock()
+    @property
+    def name(self):
+        return self.__name
+
+    def observe(self, value, *label_values):
+        index = len(self.__buckets)
+        for i, bound in enumerate(self.__buckets):
+            if value <= bound:
+                index = i
+                break
+        with self.__lock:
+            if label_values not in self.__values:
+                self.__values[label_values] = [[0] * (len(self.__buckets)+1), 0.0]
+            counts = self.__values[label_values]
+            counts[0][index] += 1
+            counts[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.__name} {self.__help}', f'# TYPE {self.__name} histogram']
+        with self.__lock:
+            for label_values, (bucket_counts, total) in sorted(self.__values.items()):
+                labels = tuple(zip(self.__label_names, label_values))
+                cumulative = 0
+                for bound, count in zip(self.__buckets + ('+Inf',), bucket_counts):
+                    cumulative += count
+                    lines.append(f'{self.__name}_bucket{format_labels(labels + (("le", bound),))} {cumulative}')
+                lines.append(f'{self.__name}_sum{format_labels(labels)} {total}')
+                lines.append(f'{self.__name}_count{format_labels(labels)} {cumulative}')
+        return lines
+
+solves = Counter('noq_solves_total',
+    'Solves, by puzzle type and outcome.', ('puzzle_type', 'outcome'))
+solve_duration = Histogram('noq_solve_duration_seconds',
+    'Time from receiving a puzzle until its solutions were ready, by puzzle type and outcome.',
+    ('puzzle_type', 'outcome'))
+
+def get_label(puzzle_type):
+    '''
+    Returns the puzzle_type label for a requested puzzle type
+    ('unknown' if it isn't one, so that bad requests can't create new series).
+    '''
+    import solvers
+    return puzzle_type if puzzle_type in solvers.SOLVER_MODULES else 'unknown'
+
+def observe_solve(puzzle_type, outcome, seconds):
+    '''
+    Records a finished solve (see the module docstring for the outcomes).
+    '''
+    puzzle_type = get_label(puzzle_type)
+    solves.inc(puzzle_type, outcome)
+    solve_duration.observe(seconds, puzzle_type, outcome)
+
+def render_gauge(name, help_text, values):
+    '''
+    Returns the lines of a gauge, given a list of (labels, value).
+    '''
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+    lines += [f'{name}{format_labels(labels)} {value}' for labels, value in values]
+    return lines
+
+def render():
+    '''
+    Returns all of the metrics, in the Prometheus text format.
+    '''
+    from . import cache, workers
+    lines = solves.render() + solve_duration.render()
+
+    pool = workers.get_pool()
+    lines += render_gauge('noq_solver_processes',
+        'Solver worker processes (0 means solves run in a thread of the web process).',
+        [((), pool.size)])
+    lines += render_gauge('noq_solves_in_flight',
+        'Solves that are queued or running on the solver pool, by puzzle type.',
+        [((('puzzle_type', puzzle_type),), count) for puzzle_type, count in sorted(pool.in_flight().items())])
+
+    stats = cache.get_cache().stats()
+    lines += ['# HELP noq_solution_cache_lookups_total Solution cache lookups, by result.',
+        '# TYPE noq_solution_cache_lookups_total counter']
+    for result in ('memory_hits', 'disk_hits', 'misses'):
+        lines.append(f'noq_solution_cache_lookups_total{format_labels((("result", result),))} {stats[result]}')
+    lines += ['# HELP noq_solution_cache_symmetry_hits_total Cache hits (also counted above) on a rotated / reflected puzzle.',
+        '# TYPE noq_solution_cache_symmetry_hits_total counter',
+        f'noq_solution_cache_symmetry_hits_total {stats["symmetry_hits"]}']
+    lines += render_gauge('noq_solution_cache_bytes', 'Size of the in-memory solution cache.',
+        [((), stats['memory_bytes'])])
+    lines += render_gauge('noq_solution_cache_entries', 'Entries in the in-memory solution cache.',
+        [((), stats['memory_entries'])])
+    return '\n'.join(lines) + '\n'
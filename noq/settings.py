@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'noq',
 ]
 
 MIDDLEWARE = [
@@ -82,6 +83,73 @@ DATABASES = {
 }
 
 
+# Solver worker pool (see noq/workers.py)
+# Each worker process has its own claspy state, so this is how many puzzles
+# can be solved at once; 0 solves puzzles one at a time in a thread of the web process.
+# The pool size is per web process: every web process (e.g. each of gunicorn's
+# --workers) starts a pool of its own, so set SOLVER_WEB_PROCESSES to how many
+# there are, and they'll share the CPUs instead of each starting one solver per CPU.
+
+SOLVER_WEB_PROCESSES = int(os.environ.get('NOQ_WEB_PROCESSES', 1))
+
+SOLVER_POOL_SIZE = max(1, (os.cpu_count() or 1) // SOLVER_WEB_PROCESSES)
+
+# How many solves of a single puzzle type may be queued or running at once,
+# and how many seconds a request waits for a free slot before getting a 503.
+
+SOLVER_QUEUE_LIMIT = 2 * SOLVER_POOL_SIZE
+
+SOLVER_QUEUE_TIMEOUT = 5
+
+# How many seconds a solve through the `solver` view (without a timeout_ms)
+# may take before the request gives up with a 504 and the solve is cancelled,
+# and how long a Server-Sent Events stream of a job is kept open;
+# None to wait as long as it takes.
+
+SOLVER_TIMEOUT = 60
+
+# How the solver pages solve a puzzle:
+#  - 'solve': a single request to the `solver` view, which waits for the solutions
+#  - 'poll': an asynchronous job (see noq/jobs.py), checked on every so often
+#  - 'stream': an asynchronous job whose solutions are streamed as they're found
+#  (with Server-Sent Events), checking on it instead if the stream can't be opened
+# Jobs live in the memory of the web process that created them, so 'poll' and
+# 'stream' need all of a page's requests to reach the same web process (a single
+# web process, or sticky sessions); and a stream holds a connection (and, with a
+# synchronous server, a web worker) open for the solve, up to SOLVER_TIMEOUT.
+
+SOLVER_BROWSER_MODE = 'solve'
+
+# The puzzle types whose solvers every worker process imports as it starts;
+# the others are imported the first time a puzzle of their type arrives.
+
+SOLVER_WARM_UP = ()
+
+# How many seconds the result of an asynchronous job (see noq/jobs.py)
+# is kept after it finishes.
+
+SOLVER_JOB_TTL = 600
+
+# The most solutions that a request may ask for (with max_solutions).
+
+SOLVER_MAX_SOLUTIONS = 100
+
+# If not None, a directory that solves requested with profile=1 dump their
+# cProfile stats into (as <puzzle type>-<random id>.pstats; see noq/workers.py).
+
+SOLVER_PROFILE_DIR = None
+
+# Solution cache (see noq/cache.py): the max size of the in-memory tier,
+# and optionally a SQLite database (which may be the one in DATABASES) for
+# an on-disk tier that is shared between processes, and its max size.
+
+SOLUTION_CACHE_MAX_BYTES = 32 * 2**20
+
+SOLUTION_CACHE_DB = None
+
+SOLUTION_CACHE_DB_MAX_BYTES = 256 * 2**20
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
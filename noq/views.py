@@ -4,13 +4,19 @@ from django.template import Template, RequestContext, Context
 from django.urls import include, path
 from django.views.generic.base import RedirectView
 from django.contrib import admin
+from django.conf import settings
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
 import traceback
 import json
+import time
 from static import utils
 from static.consts import types as PUZZLE_TYPES, cats as CATS
 
 def create_view(pt_dict):
-    return lambda request: render(request, './noq.html', pt_dict)
+    # how the page should solve puzzles ('solve', 'poll' or 'stream'; see settings.py)
+    return lambda request: render(request, './noq.html',
+        dict(pt_dict, solver_mode = getattr(settings, 'SOLVER_BROWSER_MODE', 'solve')))
 
 def redirect_view(red_url):
     return RedirectView.as_view(url=red_url)
@@ -54,17 +60,28 @@ for pt_dict in PUZZLE_TYPES:
 
 # internal/custom views
 
-from solvers import *
-from solvers.claspy import *
+from . import metrics, workers
 
 def solver(request):
     try:
-        reset()
-        module = globals()[request.GET['puzzle_type']]
-        puzzle_encoding = module.encode(request.GET['puzzle'])
-        solutions_encoded = module.solve(puzzle_encoding)
-        solutions_decoded = module.decode(solutions_encoded)
+        try:
+            options = workers.SolveOptions.from_params(request.GET)
+        except ValueError:
+            metrics.observe_solve(request.GET.get('puzzle_type'), 'invalid', 0)
+            raise
+        solutions_decoded = workers.get_pool().solve(request.GET['puzzle_type'], request.GET['puzzle'], options,
+            getattr(settings, 'SOLVER_TIMEOUT', None))
         return HttpResponse(solutions_decoded)
+    # the pool is full; ask the browser to retry later
+    except workers.SolverBusy as err:
+        return HttpResponse(json.dumps({
+            'message': str(err)
+        }), status=503)
+    # the solve ran past its deadline (and was cancelled)
+    except workers.SolverTimeout as err:
+        return HttpResponse(json.dumps({
+            'message': str(err)
+        }), status=504)
     # show error messages
     except ValueError as err:
         print(traceback.print_exc(),flush=True)
@@ -77,8 +94,168 @@ def solver(request):
             'message': str(exc)
         }))
 
+from . import jobs
+
+@csrf_exempt
+@require_POST
+def solver_jobs(request):
+    '''
+    Queues a puzzle (POST fields 'puzzle_type', 'puzzle', and optionally
+    'mode', 'max_solutions', 'timeout_ms' and 'profile') to be solved in the background,
+    and returns the new job without waiting for it.
+    '''
+    try:
+        job = jobs.get_store().submit(request.POST['puzzle_type'], request.POST['puzzle'],
+            workers.SolveOptions.from_params(request.POST))
+        response = HttpResponse(job.to_json(), status=202)
+        response['Location'] = f'/solver/jobs/{job.id}'
+        return response
+    except workers.SolverBusy as err:
+        return HttpResponse(json.dumps({
+            'message': str(err)
+        }), status=503)
+    except KeyError as err:
+        return HttpResponseBadRequest(json.dumps({
+            'message': f'Missing field: {err}'
+        }))
+    except ValueError as err:
+        print(traceback.print_exc(),flush=True)
+        return HttpResponseBadRequest(json.dumps({
+            'message': str(err)
+        }))
+    except Exception as exc:
+        print(traceback.print_exc(),flush=True)
+        return HttpResponseServerError(json.dumps({
+            'message': str(exc)
+        }))
+
+@csrf_exempt
+@require_http_methods(['GET', 'DELETE'])
+def solver_job(request, job_id):
+    '''
+    Returns the state of a job, the solutions it has found so far,
+    and all of its solutions once it is done.
+    DELETE cancels the job (e.g. when the user stops waiting for it).
+    '''
+    if request.method == 'DELETE':
+        job = jobs.get_store().cancel(job_id)
+    else:
+        job = jobs.get_store().get(job_id)
+    if job is None:
+        return HttpResponseNotFound(json.dumps({
+            'message': 'No such job (it may have expired).'
+        }))
+    return HttpResponse(job.to_json())
+
+def server_sent_events(job, cancel_on_disconnect = False):
+    '''
+    Returns a response that streams a job's progress (see jobs.JobStore.follow)
+    as Server-Sent Events. If cancel_on_disconnect, the job is cancelled when
+    the client goes away before it's done.
+
+    The stream ends after SOLVER_TIMEOUT seconds, or shortly after the job's
+    deadline, if the job isn't done by then: if cancel_on_disconnect, the job
+    is cancelled and the last event is an 'error' (status 504); otherwise
+    the job keeps going, and the last event is a 'timeout', after which
+    the client can check on the job with GET /solver/jobs/<id>.
+    '''
+    timeout = getattr(settings, 'SOLVER_TIMEOUT', None)
+    deadline = None if timeout is None else time.time() + timeout
+    if job.options.deadline is not None:
+        job_deadline = job.options.deadline + workers.DEADLINE_GRACE
+        deadline = job_deadline if deadline is None else min(deadline, job_deadline)
+    def stream():
+        finished = False
+        try:
+            for event, data in jobs.get_store().follow(job, deadline = deadline):
+                if event == 'keepalive':
+                    yield ': keepalive\n\n'
+                    continue
+                if event == 'timeout':
+                    if cancel_on_disconnect:
+                        jobs.get_store().cancel(job.id, timed_out=True)
+                        event, data = 'error', {'status': 504, 'message': 'The puzzle took too long to solve.'}
+                    else:
+                        data = {'id': job.id}
+                yield f'event: {event}\ndata: {json.dumps(data)}\n\n'
+            finished = True
+        finally:
+            if cancel_on_disconnect and not finished:
+                jobs.get_store().cancel(job.id)
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # don't let a proxy buffer the events
+    return response
+
+@require_GET
+def solver_stream(request):
+    '''
+    Like `solver`, but streams each solution (as a Server-Sent Event) as soon as
+    it's found, followed by a 'num_solutions' event; closing the stream cancels the solve.
+    '''
+    try:
+        job = jobs.get_store().submit(request.GET['puzzle_type'], request.GET['puzzle'],
+            workers.SolveOptions.from_params(request.GET))
+        return server_sent_events(job, cancel_on_disconnect=True)
+    except workers.SolverBusy as err:
+        return HttpResponse(json.dumps({
+            'message': str(err)
+        }), status=503)
+    except KeyError as err:
+        return HttpResponseBadRequest(json.dumps({
+            'message': f'Missing field: {err}'
+        }))
+    except ValueError as err:
+        print(traceback.print_exc(),flush=True)
+        return HttpResponseBadRequest(json.dumps({
+            'message': str(err)
+        }))
+    except Exception as exc:
+        print(traceback.print_exc(),flush=True)
+        return HttpResponseServerError(json.dumps({
+            'message': str(exc)
+        }))
+
+@require_GET
+def solver_job_events(request, job_id):
+    '''
+    Streams a job's solutions (as Server-Sent Events) as soon as they're found.
+    '''
+    job = jobs.get_store().get(job_id)
+    if job is None:
+        return HttpResponseNotFound(json.dumps({
+            'message': 'No such job (it may have expired).'
+        }))
+    return server_sent_events(job)
+
+from . import batch
+
+@csrf_exempt
+@require_POST
+def solver_batch(request):
+    '''
+    Solves a batch of puzzles, given as JSON Lines in the request body,
+    and streams back a JSON Lines result for each one (see batch.py).
+    Each puzzle may take up to SOLVER_TIMEOUT seconds, unless it sets its own timeout_ms.
+    '''
+    return StreamingHttpResponse(batch.solve_batch(workers.get_pool(), request,
+        getattr(settings, 'SOLVER_TIMEOUT', None)), content_type='application/jsonl')
+
+@require_GET
+def metrics_view(request):
+    '''
+    Returns the solver service's metrics, for Prometheus to scrape (see metrics.py).
+    '''
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # append internal urlpatterns
 urlpatterns += [
     path('admin/', admin.site.urls),
     path('solver', solver, name='solver'),
+    path('solver/jobs', solver_jobs, name='solver_jobs'),
+    path('solver/jobs/<str:job_id>', solver_job, name='solver_job'),
+    path('solver/jobs/<str:job_id>/events', solver_job_events, name='solver_job_events'),
+    path('solver/stream', solver_stream, name='solver_stream'),
+    path('solver/batch', solver_batch, name='solver_batch'),
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -0,0 +1,425 @@
+'''
+A pool of solver processes that the `solver` view dispatches to.
+
+claspy keeps the constraints of the puzzle being solved in module-level
+globals, so a single process can only work on one puzzle at a time.
+Every worker process here owns its own copy of that state (and launches
+its own clasp subprocesses), which lets one Django process serve several
+solves at once across all cores.
+'''
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from . import cache, metrics
+
+class SolverBusy(Exception):
+    '''
+    Raised when a puzzle type (or the whole pool) already has as many
+    solves queued as it is allowed to.
+    '''
+    pass
+
+class SolverTimeout(Exception):
+    '''
+    Raised when a synchronous solve doesn't finish by its deadline.
+    '''
+    pass
+
+# how many seconds past a solve's deadline to wait for its result
+# (a solve that runs out of time still returns the solutions it found)
+DEADLINE_GRACE = 1
+
+def init_worker(puzzle_types = ()):
+    '''
+    Runs once in every worker process, so that the solver modules of the
+    given puzzle types are imported before the first puzzle arrives
+    (the others are imported when a puzzle of their type first arrives).
+    '''
+    import solvers
+    solvers.warm_up(puzzle_types)
+
+def get_solver_module(puzzle_type):
+    '''
+    Returns the solver module for the given puzzle type.
+    '''
+    import solvers
+    if puzzle_type not in solvers.SOLVER_MODULES:
+        raise ValueError(f'Unknown puzzle type: {puzzle_type}')
+    return solvers.get_solver(puzzle_type)
+
+class SolveOptions:
+    '''
+    The per-request options of a solve (see utils.solutions.set_solve_options).
+    '''
+    def __init__(self, mode = 'all', max_solutions = None, timeout_ms = None, profile = False):
+        '''
+        mode = 'all' to find every solution (up to max_solutions),
+        or 'unique' to only find out whether there is exactly one
+        max_solutions = max # solutions to find (None for the default)
+        timeout_ms = # milliseconds after which to give up and return the solutions found so far
+        (None for no limit); the clock starts now, so time spent in the queue counts
+        profile = True to add a "profile" of where the solve spent its time to the result
+        (see solvers/utils/profiling.py); if the SOLVER_PROFILE_DIR setting is set,
+        the solve's cProfile stats are also dumped there
+
+        Raises ValueError if an option is invalid.
+        '''
+        from solvers.utils.solutions import SOLVE_MODES, MAX_SOLUTIONS_TO_FIND
+        if mode not in SOLVE_MODES:
+            raise ValueError(f'Unknown solve mode: {mode}')
+        if max_solutions is None:
+            max_solutions = MAX_SOLUTIONS_TO_FIND
+        max_allowed = getattr(settings, 'SOLVER_MAX_SOLUTIONS', 100)
+        if not 1 <= max_solutions <= max_allowed:
+            raise ValueError(f'max_solutions must be between 1 and {max_allowed}.')
+        if timeout_ms is not None and timeout_ms <= 0:
+            raise ValueError('timeout_ms must be positive.')
+        self.mode = mode
+        self.max_solutions = max_solutions
+        self.timeout_ms = timeout_ms
+        self.deadline = None if timeout_ms is None else time.time() + timeout_ms / 1000
+        self.profile = profile
+        # (read here, since the worker processes don't load the settings)
+        self.profile_dir = getattr(settings, 'SOLVER_PROFILE_DIR', None) if profile else None
+
+    @classmethod
+    def from_params(cls, params):
+        '''
+        Reads the options from a request's GET or POST parameters
+        ('mode', 'max_solutions', 'timeout_ms', 'profile').
+        '''
+        def get_int(name):
+            if params.get(name, '') == '':
+                return None
+            try:
+                return int(params[name])
+            except ValueError:
+                raise ValueError(f'{name} must be an integer.')
+        profile = params.get('profile', False) in (True, 1, '1', 'true', 'True')
+        return cls(params.get('mode', 'all'), get_int('max_solutions'), get_int('timeout_ms'), profile)
+
+def encode(module, puzzle, options = None):
+    '''
+    Encodes a puzzle (the JSON string from the browser).
+
+    Returns (the puzzle's Encoding, a solvers.utils.profiling.Profile with the
+    time spent encoding if the options ask for a profile, or else None).
+    '''
+    from solvers.utils.profiling import Profile
+    if options is None or not options.profile:
+        return module.encode(puzzle), None
+    profile = Profile()
+    start = time.perf_counter()
+    puzzle_encoding = module.encode(puzzle)
+    profile.add('encode', time.perf_counter() - start)
+    return puzzle_encoding, profile
+
+def decode(module, solutions, options = None, truncated = False, profile = None):
+    '''
+    Decodes the solutions found by a solve with the given options.
+    If the solve gave up early, the result has "truncated": true.
+    If there's a profile (see encode), the time spent decoding is added to it,
+    and the result has its "profile".
+    '''
+    from solvers import utils
+    start = time.perf_counter()
+    if options is not None and options.mode == utils.solutions.UNIQUENESS_CHECK:
+        solution_str = utils.decode_uniqueness(solutions, module.decode)
+    else:
+        solution_str = module.decode(solutions)
+    if truncated:
+        solution_str = solution_str[:-1] + ',"truncated":true}'
+    if profile is not None:
+        profile.add('decode', time.perf_counter() - start)
+        solution_str = solution_str[:-1] + ',"profile":' + json.dumps(profile.to_dict()) + '}'
+    return solution_str
+
+def run_solver(puzzle_type, puzzle_encoding, options = None, cancel_event = None):
+    '''
+    Solves an encoded puzzle in the current process.
+    options = the SolveOptions (None for the defaults)
+    cancel_event = an Event that is set to give up early (None if it can't be cancelled)
+
+    Returns (the list of solutions (which still need to be decoded),
+    whether the solve gave up before finding all of them,
+    the solve's profile as a dictionary if the options ask for one, or else None).
+    '''
+    from solvers.claspy import reset
+    from solvers import utils
+    reset()
+    module = get_solver_module(puzzle_type)
+    if options is None:
+        utils.solutions.set_solve_options(solve_cancel_event = cancel_event)
+    else:
+        utils.solutions.set_solve_options(options.mode, options.max_solutions,
+            options.deadline, cancel_event)
+        if options.profile:
+            pstats_path = None
+            if options.profile_dir:
+                pstats_path = os.path.join(options.profile_dir, f'{puzzle_type}-{uuid.uuid4().hex}.pstats')
+            utils.profiling.start_profile(pstats_path)
+    try:
+        with utils.profiling.phase('solve'):
+            solutions = module.solve(puzzle_encoding)
+        truncated = utils.solutions.truncated
+    finally:
+        profile = utils.profiling.stop_profile()
+        utils.solutions.set_solve_options()
+    if profile is not None:
+        for key in ('num_vars', 'num_rules'):
+            if key in utils.solutions.solve_stats:
+                profile.count(key, utils.solutions.solve_stats[key])
+        profile = profile.to_dict()
+    return solutions, truncated, profile
+
+def run_solver_job(puzzle_type, puzzle_encoding, job_id, events, options = None, cancel_event = None):
+    '''
+    Like run_solver, but also reports progress on `events` (a queue shared
+    with the web process) as (job_id, event, data) tuples:
+     - (job_id, 'started', None) when a worker picks the job up
+     - (job_id, 'solution', solution) every time a solution is found
+    '''
+    from solvers import utils
+    events.put((job_id, 'started', None))
+    utils.solutions.solution_listener = lambda solution: events.put((job_id, 'solution', solution))
+    try:
+        return run_solver(puzzle_type, puzzle_encoding, options, cancel_event)
+    finally:
+        utils.solutions.solution_listener = None
+
+class SolverPool:
+    '''
+    A fixed-size pool of solver processes with a bounded queue per puzzle type.
+
+    Each puzzle type may have at most `queue_limit` solves queued or running
+    at once, and the pool as a whole at most `size * queue_limit`; a submit
+    that cannot get a slot within `queue_timeout` seconds raises SolverBusy,
+    so a flood of slow puzzles of one type cannot starve every other type.
+    '''
+    def __init__(self, size, queue_limit, queue_timeout, warm_up_types = ()):
+        '''
+        size = # worker processes; 0 means solve in a single thread of this process
+        queue_limit = max # solves of a single puzzle type queued or running at once
+        queue_timeout = # seconds to wait for a free slot before giving up
+        warm_up_types = the puzzle types whose solvers every worker imports as it starts
+        '''
+        self.__size = size
+        self.__warm_up_types = tuple(warm_up_types)
+        self.__queue_limit = queue_limit
+        self.__queue_timeout = queue_timeout
+        self.__executor = None
+        self.__manager = None
+        self.__events = None
+        self.__lock = threading.Lock()
+        self.__total_slots = threading.BoundedSemaphore(max(1, size) * queue_limit)
+        self.__type_slots = {}
+        self.__in_flight = {} # puzzle type -> # solves queued or running
+    @property
+    def size(self):
+        return self.__size
+    @property
+    def queue_limit(self):
+        return self.__queue_limit
+    @property
+    def queue_timeout(self):
+        return self.__queue_timeout
+
+    def executor(self):
+        '''
+        Returns the process pool, starting it if necessary.
+
+        With a pool size of 0 this is a single thread in the current process
+        (claspy's state is global, so inline solves must not overlap).
+        '''
+        with self.__lock:
+            if self.__executor is None:
+                if self.__size == 0:
+                    self.__executor = ThreadPoolExecutor(max_workers = 1)
+                else:
+                    self.__executor = ProcessPoolExecutor(
+                        max_workers = self.__size,
+                        mp_context = multiprocessing.get_context('spawn'),
+                        initializer = init_worker,
+                        initargs = (self.__warm_up_types,))
+            return self.__executor
+
+    def __get_manager(self):
+        if self.__manager is None:
+            self.__manager = multiprocessing.get_context('spawn').Manager()
+        return self.__manager
+
+    def event_queue(self):
+        '''
+        Returns a queue that workers can put progress events on
+        and that the web process can read them from.
+        '''
+        with self.__lock:
+            if self.__events is None:
+                if self.__size == 0:
+                    self.__events = queue.Queue()
+                else:
+                    self.__events = self.__get_manager().Queue()
+            return self.__events
+
+    def cancel_event(self):
+        '''
+        Returns a new Event that the web process can set to cancel a solve
+        (see utils.solutions.stop_requested).
+        '''
+        with self.__lock:
+            if self.__size == 0:
+                return threading.Event()
+            return self.__get_manager().Event()
+
+    def in_flight(self):
+        '''
+        Returns a dictionary mapping puzzle types to their # solves that are queued or running.
+        '''
+        with self.__lock:
+            return dict(self.__in_flight)
+
+    def warm_up(self):
+        '''
+        Starts every worker process (and imports the warm-up solvers in it)
+        ahead of the first request.
+        '''
+        executor = self.executor()
+        for future in [executor.submit(init_worker, self.__warm_up_types) for i in range(max(1, self.__size))]:
+            future.result()
+
+    def shutdown(self):
+        with self.__lock:
+            if self.__executor is not None:
+                self.__executor.shutdown(wait = False, cancel_futures = True)
+                self.__executor = None
+
+    def __type_semaphore(self, puzzle_type):
+        with self.__lock:
+            if puzzle_type not in self.__type_slots:
+                self.__type_slots[puzzle_type] = threading.BoundedSemaphore(self.__queue_limit)
+            return self.__type_slots[puzzle_type]
+
+    def submit(self, function, puzzle_type, *args):
+        '''
+        Queues function(puzzle_type, *args) on a worker process.
+
+        Returns a future for its result, or raises SolverBusy if the queue
+        for this puzzle type does not free up within the queue timeout.
+        '''
+        type_slots = self.__type_semaphore(puzzle_type)
+        if not type_slots.acquire(timeout = self.__queue_timeout):
+            raise SolverBusy(f'Too many {puzzle_type} puzzles are being solved right now; please try again shortly.')
+        if not self.__total_slots.acquire(timeout = self.__queue_timeout):
+            type_slots.release()
+            raise SolverBusy('The solver is busy right now; please try again shortly.')
+
+        with self.__lock:
+            self.__in_flight[puzzle_type] = self.__in_flight.get(puzzle_type, 0) + 1
+
+        def release(future):
+            with self.__lock:
+                self.__in_flight[puzzle_type] -= 1
+            self.__total_slots.release()
+            type_slots.release()
+
+        try:
+            future = self.executor().submit(function, puzzle_type, *args)
+        except BrokenProcessPool:
+            # a worker died (e.g. it was killed for using too much memory);
+            # start a fresh pool for the next request
+            release(None)
+            self.shutdown()
+            raise RuntimeError('A solver process crashed; please try again.')
+        except:
+            release(None)
+            raise
+        future.add_done_callback(release)
+        return future
+
+    def solve(self, puzzle_type, puzzle, options = None, timeout = None):
+        '''
+        Solves a puzzle (given as the JSON string from the browser) on a
+        worker process, unless it is already in the solution cache.
+        options = the SolveOptions (None for the defaults)
+        timeout = max # seconds to wait for the solve if the options have no
+        deadline (None to wait as long as it takes)
+
+        Returns the decoded solutions. Raises SolverTimeout if the solve
+        isn't done shortly after its deadline (e.g. because it's still
+        building its constraints), after cancelling it.
+        '''
+        start, outcome = time.perf_counter(), 'error'
+        try:
+            if options is None:
+                options = SolveOptions()
+            module = get_solver_module(puzzle_type)
+            puzzle_encoding, profile = encode(module, puzzle, options)
+            solution_cache = cache.get_cache()
+            key, solutions = solution_cache.lookup(puzzle_type, puzzle_encoding,
+                getattr(module, 'SYMMETRY', None), options.mode, options.max_solutions)
+            truncated = False
+            if solutions is None:
+                deadline = options.deadline
+                if deadline is None and timeout is not None:
+                    deadline = time.time() + timeout
+                cancel_event = self.cancel_event()
+                future = self.submit(run_solver, puzzle_type, puzzle_encoding, options, cancel_event)
+                try:
+                    solutions, truncated, solve_profile = future.result(
+                        None if deadline is None else max(0, deadline - time.time()) + DEADLINE_GRACE)
+                except FutureTimeout:
+                    # stop the solve as soon as it checks (or before it starts), to free its slot
+                    cancel_event.set()
+                    future.cancel()
+                    outcome = 'timeout'
+                    raise SolverTimeout('The puzzle took too long to solve.')
+                except BrokenProcessPool:
+                    self.shutdown()
+                    raise RuntimeError('A solver process crashed; please try again.')
+                # a truncated list of solutions depends on how fast the solve was
+                if not truncated:
+                    solution_cache.put(key, solutions)
+                if profile is not None:
+                    profile.merge(solve_profile)
+                outcome = 'truncated' if truncated else 'solved'
+            else:
+                if profile is not None:
+                    profile.count('cache_hits')
+                outcome = 'cached'
+            return decode(module, solutions, options, truncated, profile)
+        except SolverBusy:
+            outcome = 'busy'
+            raise
+        except ValueError:
+            outcome = 'invalid'
+            raise
+        finally:
+            metrics.observe_solve(puzzle_type, outcome, time.perf_counter() - start)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    '''
+    Returns this process's solver pool, creating it from the settings
+    (SOLVER_POOL_SIZE, SOLVER_QUEUE_LIMIT, SOLVER_QUEUE_TIMEOUT, SOLVER_WARM_UP) on first use.
+    Every web process has its own pool, of SOLVER_POOL_SIZE processes.
+    '''
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            size = getattr(settings, 'SOLVER_POOL_SIZE', 1)
+            _pool = SolverPool(size,
+                getattr(settings, 'SOLVER_QUEUE_LIMIT', 2 * max(1, size)),
+                getattr(settings, 'SOLVER_QUEUE_TIMEOUT', 5),
+                getattr(settings, 'SOLVER_WARM_UP', ()))
+        return _pool
@@ -1,7 +1,44 @@
-from os.path import dirname, basename, isfile, join
-import glob
+'''
+The solver modules, one per puzzle type.
 
-modules = glob.glob(join(dirname(__file__), '*.py'))
-submodules = [basename(f)[:-3] for f in modules if isfile(f) and not f.endswith('__init__.py')]
-for submodule in submodules:
-    exec(f'import solvers.{submodule}')
\ No newline at end of file
+A solver module is only imported the first time it's used, either as an
+attribute (`solvers.lits`) or through get_solver('lits'), so that a
+process only pays for the puzzle types it actually solves.
+The puzzle types are the ones listed in static/consts.py.
+'''
+import importlib
+import threading
+
+from static.consts import types as PUZZLE_TYPES
+
+# puzzle type -> the path of its solver module
+SOLVER_MODULES = {pt_dict['value']: f'{__name__}.{pt_dict["value"]}' for pt_dict in PUZZLE_TYPES}
+
+_import_lock = threading.Lock()
+
+def get_solver(puzzle_type):
+    '''
+    Returns the solver module for a puzzle type, importing it if necessary.
+    Raises KeyError if there is no such puzzle type.
+    '''
+    module_path = SOLVER_MODULES[puzzle_type]
+    # importlib has its own per-module locks; this one just keeps
+    # two threads from both paying for the same import at once
+    with _import_lock:
+        return importlib.import_module(module_path)
+
+def warm_up(puzzle_types = None):
+    '''
+    Imports the solver modules of the given puzzle types ahead of time
+    (None for all of them).
+    '''
+    for puzzle_type in SOLVER_MODULES if puzzle_types is None else puzzle_types:
+        get_solver(puzzle_type)
+
+def __getattr__(name):
+    if name in SOLVER_MODULES:
+        return get_solver(name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+def __dir__():
+    return sorted(set(globals()) | set(SOLVER_MODULES))
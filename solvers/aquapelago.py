@@ -1,6 +1,8 @@
 from .claspy import *
 from . import utils
 
+SYMMETRY = utils.symmetry.GenreSymmetry()
+
 def encode(string):
     return utils.encode(string, clue_encoder = lambda s : s)
 
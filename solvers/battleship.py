@@ -163,7 +163,8 @@ def solve(E):
         
     return get_all_grid_solutions(grid, 
         equality_function = equality_function, 
-        format_function = format_function)
+        format_function = format_function,
+        projection = [[x == max_id for x in row] for row in grid])
 
 def decode(solutions):
     return utils.decode(solutions)
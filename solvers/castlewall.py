@@ -2,6 +2,9 @@ from .claspy import *
 from . import utils
 from .utils.loops import *
 
+SYMMETRY = utils.symmetry.GenreSymmetry(clue_map = utils.symmetry.remap_arrows,
+    solution_map = utils.symmetry.remap_loop_image)
+
 # DIRECTION_TO_OFFSET = {
 #     'u': (-1, 0),
 #     'r': (0, 1),
@@ -3,6 +3,8 @@ from . import utils
 from .utils.regions import *
 from .utils.shading import *
 
+SYMMETRY = utils.symmetry.GenreSymmetry()
+
 def encode(string):
     return utils.encode(string, has_borders = True)
     
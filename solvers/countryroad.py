@@ -1,8 +1,10 @@
 from .claspy import *
 from . import utils
 
+SYMMETRY = utils.symmetry.GenreSymmetry(solution_map = utils.symmetry.remap_loop_image)
+
 def encode(string):
-    return utils.encode(string, has_borders = True)
+    return utils.encode(string, has_borders = True, packed = True)
     
 def solve(E):
     rooms = utils.regions.full_bfs(E.R, E.C, E.edges)
@@ -41,8 +41,7 @@ def solve(E):
     for (r,c) in E.clues:
         require(numbers_solver.grid[r][c] == E.clues[(r,c)])
 
-    solutions = []
-    while len(solutions) < utils.MAX_SOLUTIONS_TO_FIND and claspy_solve():
+    def generate_solution():
         solution = {}
         for r in range(n):
             for c in range(n):
@@ -51,7 +50,9 @@ def solve(E):
                     solution[key] = 'black'
                 else:
                     solution[key] = numbers_solver.grid[r][c].value()
-        solutions.append(solution)
+        return solution
+
+    def avoid_duplicate_solution():
         # Once a solution is found, add a constraint eliminating it.
         x = BoolVar(True)
         for r in range(n):
@@ -61,8 +62,8 @@ def solve(E):
                 else:
                     x = x & (numbers_solver.grid[r][c] == numbers_solver.grid[r][c].value())
         require(~x)
-    
-    return solutions
+
+    return utils.solutions.get_all_solutions(generate_solution, avoid_duplicate_solution)
     
 def decode(solutions):
     return utils.decode(solutions)
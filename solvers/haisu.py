@@ -3,41 +3,29 @@ from . import utils
 from .utils.loops import *
 from .utils import grids
 
+# How the path's order (and so the visit numbers) is encoded:
+#  - COUNTERS: an Atom per cell for "reached from S", and a count of the visits
+#  so far to each numbered room, carried along the path from cell to cell,
+#  so it grows with R*C * (the sum of each numbered room's largest number)
+#  - PAIRWISE: an Atom for every ordered pair of cells (u, v) that's true iff u comes
+#  (weakly) before v, so it grows with (R*C)^2; only practical up to about 10x10.
+#  It's kept as a reference that `python -m test.benchmark --haisu` checks
+#  COUNTERS against (the same solutions, and COUNTERS solving 14x14 puzzles
+#  that PAIRWISE times out on)
+COUNTERS = 'counters'
+PAIRWISE = 'pairwise'
+ORDER_ENCODING = COUNTERS
+
 def encode(string):
     return utils.encode(string, has_borders = True, clue_encoder = lambda x : int(x) if x.isnumeric() else x)
     
-def solve(E):
-    if not ('S' in E.clues.values() and 'G' in E.clues.values()):
-        raise ValueError('S and G squares must be provided.')
-
-    rooms = utils.regions.full_bfs(E.R, E.C, E.edges)
-
-    room_has_start = {room: False for room in rooms}
-    start = None
-    goal = None
-    for room in rooms:
-        for (r, c) in room:
-            clue = E.clues.get((r,c))
-            if clue == 'S':
-                start = (r,c)
-                room_has_start[room] = True
-            elif clue == 'G':
-                goal = (r,c)
-
-    cell_to_room, room_spanners = {}, {}
-    for room in rooms:
-        for (r, c) in room:
-            cell_to_room[(r, c)] = room
-            for (y, x) in utils.grids.get_neighbors(E.R, E.C, r, c):
-                if (y, x) not in room:
-                    if room not in room_spanners:
-                        room_spanners[room] = set()
-                    room_spanners[room].add(((r, c), (y, x)))
-
-    parent = grids.RectangularGrid(E.R, E.C, lambda r,c: MultiVar('^','v','<','>','.'))
-    require(parent[start] == '.')
-
-     # before[u][v] is true iff u comes (weakly) before v in the path
+def order_by_pairs(E, parent, start, goal):
+    '''
+    Requires the path (given by each cell's parent direction) to run from start to goal,
+    through every cell. Returns a dictionary mapping every ordered pair of cells
+    (u, v) to an Atom that's true iff u comes (weakly) before v.
+    '''
+    # before[u][v] is true iff u comes (weakly) before v in the path
     before = {}
     for coord1 in parent.iter_coords():
         for coord2 in parent.iter_coords():
@@ -68,32 +56,123 @@ def solve(E):
         if coord != goal:
             require(~before[(goal,coord)]) # nothing can come after goal
 
-    for coord in E.clues:
-        room = cell_to_room[coord]
-        value = E.clues[coord]
-        if value in ['S','G']: continue
+    return before
 
-        possible_entrances = []
-        for (A,B) in room_spanners.get(room, []): # A in room; B not in room and adj to A
-            # so we want ... -> B -> A -> ... -> coord
-            r2,c2 = B
-            if A == (r2+1,c2): # A below B
-                adj_AB = (parent[A] == '^')
-            if A == (r2-1,c2): # A above B
-                adj_AB = (parent[A] == 'v')
-            if A == (r2,c2+1): # A right of B
-                adj_AB = (parent[A] == '<')
-            if A == (r2,c2-1): # A left of B
-                adj_AB = (parent[A] == '>')
+def require_on_path(E, parent, start):
+    '''
+    Requires every cell to be reachable from start by following the path
+    (an Atom per cell), so that the path can't have a separate cycle.
+    '''
+    # on_path[u] is true iff u can be reached from start by following the path
+    on_path = {coord: Atom() for coord in parent.iter_coords()}
+    on_path[start].prove_if(True)
+    for (r, c) in parent.iter_coords():
+        for direction, (y, x) in (('^', (r-1, c)), ('v', (r+1, c)), ('<', (r, c-1)), ('>', (r, c+1))):
+            if 0 <= y < E.R and 0 <= x < E.C:
+                on_path[(r, c)].prove_if((parent[r][c] == direction) & on_path[(y, x)])
+        require(on_path[(r, c)])
 
-            possible_entrances.append(before[(A,coord)] & adj_AB)
+def require_visit_counters(E, parent, start, room_clues):
+    '''
+    Requires each number to be the visit of its room that the path is on, by carrying
+    a count of the visits to each numbered room so far along the path.
+    room_clues = a dictionary mapping rooms to their list of (cell, number)
+    '''
+    for room, clues in room_clues.items():
+        max_count = max(value for coord, value in clues) + 1
+        # visits[u][k] is true iff the path has been in the room (at least) k+1 separate times,
+        # as of cell u; counts above max_count don't matter, so they're counted as max_count
+        visits = {coord: [Atom() for k in range(max_count)] for coord in parent.iter_coords()}
+        if start in room:
+            visits[start][0].prove_if(True)
+        for (r, c) in parent.iter_coords():
+            for direction, (y, x) in (('^', (r-1, c)), ('v', (r+1, c)), ('<', (r, c-1)), ('>', (r, c+1))):
+                if 0 <= y < E.R and 0 <= x < E.C:
+                    came_from = parent[r][c] == direction
+                    if (r, c) in room and (y, x) not in room:
+                        # (r, c) starts a new visit
+                        visits[(r, c)][0].prove_if(came_from)
+                        for k in range(1, max_count):
+                            visits[(r, c)][k].prove_if(came_from & visits[(y, x)][k-1])
+                    else:
+                        for k in range(max_count):
+                            visits[(r, c)][k].prove_if(came_from & visits[(y, x)][k])
+        for coord, value in clues:
+            if value < 1:
+                raise ValueError('Numbers must be at least 1.')
+            require(visits[coord][value-1])
+            if value < max_count:
+                require(~visits[coord][value])
 
-        if room_has_start[room]:
-            require(sum_bools(value-1, possible_entrances))
-        else:
-            require(sum_bools(value, possible_entrances))
+def solve(E):
+    if not ('S' in E.clues.values() and 'G' in E.clues.values()):
+        raise ValueError('S and G squares must be provided.')
+
+    rooms = utils.regions.full_bfs(E.R, E.C, E.edges)
 
+    room_has_start = {room: False for room in rooms}
+    start = None
+    goal = None
+    for room in rooms:
+        for (r, c) in room:
+            clue = E.clues.get((r,c))
+            if clue == 'S':
+                start = (r,c)
+                room_has_start[room] = True
+            elif clue == 'G':
+                goal = (r,c)
 
+    cell_to_room = {}
+    for room in rooms:
+        for (r, c) in room:
+            cell_to_room[(r, c)] = room
+
+    parent = grids.RectangularGrid(E.R, E.C, lambda r,c: MultiVar('^','v','<','>','.'))
+    require(parent[start] == '.')
+
+    if ORDER_ENCODING == COUNTERS:
+        require_on_path(E, parent, start)
+        room_clues = {}
+        for coord, value in E.clues.items():
+            if value not in ['S','G']:
+                room_clues.setdefault(cell_to_room[coord], []).append((coord, value))
+        require_visit_counters(E, parent, start, room_clues)
+    else:
+        before = order_by_pairs(E, parent, start, goal)
+
+        room_spanners = {}
+        for room in rooms:
+            for (r, c) in room:
+                for (y, x) in utils.grids.get_neighbors(E.R, E.C, r, c):
+                    if (y, x) not in room:
+                        if room not in room_spanners:
+                            room_spanners[room] = set()
+                        room_spanners[room].add(((r, c), (y, x)))
+
+        for coord in E.clues:
+            room = cell_to_room[coord]
+            value = E.clues[coord]
+            if value in ['S','G']: continue
+
+            possible_entrances = []
+            for (A,B) in room_spanners.get(room, []): # A in room; B not in room and adj to A
+                # so we want ... -> B -> A -> ... -> coord
+                r2,c2 = B
+                if A == (r2+1,c2): # A below B
+                    adj_AB = (parent[A] == '^')
+                if A == (r2-1,c2): # A above B
+                    adj_AB = (parent[A] == 'v')
+                if A == (r2,c2+1): # A right of B
+                    adj_AB = (parent[A] == '<')
+                if A == (r2,c2-1): # A left of B
+                    adj_AB = (parent[A] == '>')
+
+                possible_entrances.append(before[(A,coord)] & adj_AB)
+
+            if room_has_start[room]:
+                require(sum_bools(value-1, possible_entrances))
+            else:
+                require(sum_bools(value, possible_entrances))
 
     # thanks for writing this formatting code jenna
 
@@ -3,6 +3,8 @@ from . import utils
 from .utils import borders
 from .utils.borders import Direction
 
+SYMMETRY = utils.symmetry.GenreSymmetry()
+
 def encode(string):
     return utils.encode(string, has_borders = True)
 
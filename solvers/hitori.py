@@ -2,6 +2,8 @@ from .claspy import *
 from . import utils
 from .utils.shading import *
 
+SYMMETRY = utils.symmetry.GenreSymmetry()
+
 def encode(string):
     return utils.encode(string)
 
@@ -3,6 +3,9 @@ from . import utils
 from .utils.loops import *
 from .utils.solutions import *
 
+SYMMETRY = utils.symmetry.GenreSymmetry(clue_map = utils.symmetry.remap_arrows,
+    solution_map = utils.symmetry.remap_loop_image)
+
 def encode(string):
     return utils.encode(string, clue_encoder = lambda l: l)
 
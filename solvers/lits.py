@@ -3,13 +3,15 @@ from . import utils
 from .utils.shapes import *
 from .utils.encoding import *
 
+SYMMETRY = utils.symmetry.GenreSymmetry()
+
 L = OMINOES[4]['L']
 I = OMINOES[4]['I']
 T = OMINOES[4]['T']
 S = OMINOES[4]['S']
 
 def encode(string):
-    return utils.encode(string, has_borders = True)
+    return utils.encode(string, has_borders = True, packed = True)
 
 def solve(E):
     regions = utils.full_bfs(E.R, E.C, E.edges)
@@ -3,7 +3,7 @@ from . import utils
 from .utils import borders
 
 def encode(string):
-    return utils.encode(string, has_borders = True, outside_clues = '1111')
+    return utils.encode(string, has_borders = True, outside_clues = '1111', packed = True)
 
 def solve(E):
     rooms = utils.regions.full_bfs(E.R, E.C, E.edges)
@@ -1,6 +1,8 @@
 from .claspy import *
 from . import utils
 
+SYMMETRY = utils.symmetry.GenreSymmetry(solution_map = utils.symmetry.remap_loop_image)
+
 def encode(string):
     def string_encoder(string):
         if string not in {'w', 'b', ''}:
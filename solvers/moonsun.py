@@ -4,6 +4,8 @@ from .utils.borders import *
 from .utils.loops import *
 from .utils.regions import *
 
+SYMMETRY = utils.symmetry.GenreSymmetry(solution_map = utils.symmetry.remap_loop_image)
+
 def encode(string):
     return utils.encode(string, clue_encoder = lambda s : s, has_borders = True)
 
@@ -1,8 +1,10 @@
 from .claspy import *
 from . import utils
 
+SYMMETRY = utils.symmetry.GenreSymmetry()
+
 def encode(string):
-    return utils.encode(string, has_borders = True)
+    return utils.encode(string, has_borders = True, packed = True)
     
 def solve(E):
     set_max_val(2)
@@ -1,6 +1,8 @@
 from .claspy import *
 from . import utils
 
+SYMMETRY = utils.symmetry.GenreSymmetry()
+
 HORIZONTAL_OFFSETS = ((0, 1), (0, -1))
 VERTICAL_OFFSETS = ((1, 0), (-1, 0))
 
@@ -2,7 +2,7 @@ from .claspy import *
 from . import utils
 
 def encode(string):
-    return utils.encode(string, has_borders = True)
+    return utils.encode(string, has_borders = True, packed = True)
                     
 def solve(E):
     rooms = utils.regions.full_bfs(E.R, E.C, E.edges)
@@ -5,8 +5,10 @@ from .utils.borders import Direction
 from .utils.shading import *
 from .utils.grids import *
 
+SYMMETRY = utils.symmetry.GenreSymmetry()
+
 def encode(string):
-    return utils.encode(string, has_borders = True)
+    return utils.encode(string, has_borders = True, packed = True)
 
 def solve(E):
     rooms = utils.regions.full_bfs(E.R, E.C, E.edges)
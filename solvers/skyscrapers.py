@@ -2,6 +2,8 @@ from .claspy import *
 from . import utils
 from .utils import encoding
 
+SYMMETRY = utils.symmetry.GenreSymmetry()
+
 def encode(string):
     return utils.encode(string, outside_clues = '1111')
 
@@ -11,10 +11,9 @@ def encode(string):
     rows, cols = int(json_params['r']), int(json_params['c'])
     clues = {}
         
-    for i in range(2*(rows+1)):
-        for j in range(2*(cols+1)):
-            if f'{i},{j}' in json_grid:
-                clues[(i,j)] = "*"
+    for i, j, value in parse_grid(json_grid):
+        if 0 <= i < 2*(rows+1) and 0 <= j < 2*(cols+1):
+            clues[(i,j)] = "*"
 
     return Encoding(rows, cols, clues)
 
@@ -64,33 +63,24 @@ def solve(E):
                         atoms[(r,c)].prove_if(atoms[(r+i,c+j)] & \
                             (grid[(r,c)] == grid[(r+i,c+j)]))
 
-    # solve
-    sols = []
-    while len(sols) < MAX_SOLUTIONS_TO_FIND and claspy_solve():
-        # append found solution
-        sol = {}
+    def generate_solution():
+        # turn the region IDs into a border diagram
+        solution = {}
         for (r,c) in grid:
-            sol[(r,c)] = grid[(r,c)].value()
-        sols.append(sol)
+            for i,j in (0,1),(0,-1),(1,0),(-1,0):
+                    if 0 <= r+i < E.R and 0 <= c+j < E.C:
+                        if grid[(r,c)].value() != grid[(r+i,c+j)].value():
+                            solution[f'{2*r+1+i},{2*c+1+j}'] = 'black'
+        return solution
 
+    def avoid_duplicate_solution():
         # prevent duplicate solution before re-solving
         x = BoolVar(True)
         for (r,c) in grid:
             x &= (grid[(r,c)] == grid[(r,c)].value())
         require(~x)
 
-    # turn solutions into border diagrams
-    border_sols = []
-    for sol in sols:
-        solution = {}
-        for (r,c) in grid:
-            for i,j in (0,1),(0,-1),(1,0),(-1,0):
-                    if 0 <= r+i < E.R and 0 <= c+j < E.C:
-                        if sol[(r,c)] != sol[(r+i,c+j)]:
-                            solution[f'{2*r+1+i},{2*c+1+j}'] = 'black'
-        border_sols.append(solution)
-
-    return border_sols
+    return get_all_solutions(generate_solution, avoid_duplicate_solution, projection = list(grid.values()))
     
 def decode(solutions):
     return utils.decode(solutions)
@@ -26,28 +26,24 @@ def solve(E):
         raise ValueError('Shape set not supported.')
 
     shape_id_bound = len(shape_id_to_variants)
-    grid = [[IntVar(0, shape_id_bound) for c in range(E.C)] for r in range(E.R)]
+    grid = [[MultiVar(*range(shape_id_bound+1)) for c in range(E.C)] for r in range(E.R)]
     s = utils.RectangularGridShadingSolver(E.R, E.C, grid, 
         shading_symbols = [shape_id for shape_id in range(shape_id_bound)])
     
-    # keep track of a list of "shape conditions", where each "shape condition" requires
-    # that all cells involved in the shape have the correct shape ID
-    # and that no other cell anywhere else does
+    # each shape is placed exactly once, and a cell has a shape's ID
+    # iff one of the shape's placements that covers it is the one placed
     for shape_id, variants in shape_id_to_variants.items():
-        possible_shape_conditions = []
+        placements, covering = get_placement_table(E.R, E.C, frozenset(variants))
+        placed = [BoolVar() for placement in placements]
+        require(sum_bools(1, placed))
         for r in range(E.R):
             for c in range(E.C):
-                for variant in variants:
-                    occupied_cells = place_shape_in_grid(E.R, E.C, variant, r, c)
-                    if occupied_cells != None:
-                        possible_shape_conditions.append(
-                            sum_bools(E.R*E.C, 
-                                [(grid[y][x] == shape_id) == ((y,x) in occupied_cells) \
-                                    for y in range(E.R) for x in range(E.C)])
-                        )
-        # exactly 1 of the possible placements is actually correct
-        require(sum_bools(1, possible_shape_conditions))
-        
+                cell_placements = [placed[i] for i in covering[r*E.C + c]]
+                if cell_placements:
+                    require((grid[r][c] == shape_id) == at_least(1, cell_placements))
+                else:
+                    require(~(grid[r][c] == shape_id))
+
     # no touchy rule
     for r in range(E.R):
         for c in range(E.C):
@@ -3,6 +3,8 @@ from . import utils
 from .utils.shading import *
 from .utils.regions import *
 
+SYMMETRY = utils.symmetry.GenreSymmetry((utils.symmetry.IDENTITY, utils.symmetry.FLIP_H)) # blocks fall down
+
 def encode(string):
     return utils.encode(string, has_borders=True)
 
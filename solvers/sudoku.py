@@ -2,6 +2,8 @@ from .claspy import *
 from . import utils
 from .utils.solutions import *
 
+SYMMETRY = utils.symmetry.GenreSymmetry()
+
 def encode(string):
     return utils.encode(string, has_params=True)
     
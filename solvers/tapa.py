@@ -2,7 +2,9 @@ from .claspy import *
 from . import utils
 from .utils.shading import *
 from .utils.solutions import *
-import itertools
+import functools
+
+SYMMETRY = utils.symmetry.GenreSymmetry()
 
 def encode(string):
     return utils.encode(string, clue_encoder = lambda s: s)
@@ -58,6 +60,35 @@ def pattern_matches(q_pattern, pattern):
         return len(q_pattern) == len(pattern) and \
             all(q_pattern.count(n) <= pattern.count(n) for n in range(1, 9))
 
+# the ring of 8 cells around a clue, in order; bit k of a mask is the shading of cell k
+RING_OFFSETS = ((0,1),(1,1),(1,0),(1,-1),(0,-1),(-1,-1),(-1,0),(-1,1))
+
+# mask -> the Tapa clue (as from parse_shading) of every shading of the ring
+MASK_CLUES = tuple(tuple(parse_shading([bool(mask >> k & 1) for k in range(8)])) for mask in range(256))
+
+def clue_key(clue):
+    '''
+        Returns a canonical (hashable) form of a Tapa clue:
+        its numbers in increasing order, then its ?s.
+        For example, ['?', 3, 1] becomes (1, 3, '?').
+    '''
+    numbers = sorted(n for n in clue if isinstance(n, int))
+    return tuple(numbers) + ('?',) * (len(clue) - len(numbers))
+
+@functools.lru_cache(maxsize = None)
+def get_clue_masks(key, on_grid):
+    '''
+        Given a clue (as from clue_key) and a mask of
+        the cells of its ring that are in the grid,
+        returns the masks of the shadings of the ring that match the clue,
+        leaving the cells off the grid unshaded.
+
+        There are only so many clues (and 256 on_grid masks, most of them
+        impossible), so the tables are built once per process.
+    '''
+    return tuple(mask for mask in range(256)
+        if mask & ~on_grid == 0 and pattern_matches(list(key), list(MASK_CLUES[mask])))
+
 def solve(E):
     shading_solver = RectangularGridShadingSolver(E.R, E.C)
 
@@ -67,23 +98,28 @@ def solve(E):
 
     # enforce Tapa clues
     for (r,c), clue in E.clues.items():
-        adj_indices = [ (r+dr,c+dc) for (dr,dc) in
-            ((0,1),(1,1),(1,0),(1,-1),(0,-1),(-1,-1),(-1,0),(-1,1))
-        ]
-        cond = False # condition that this clue is fulfilled by some shading
-        for shading in itertools.product([True,False], repeat=8):
-            if pattern_matches(clue, parse_shading(shading)): # check if this shading works
-                this_cond = True # build condition for this shading
-                for k, idx in enumerate(adj_indices):
-                    if is_valid_coord(E.R, E.C, *idx):
-                        this_cond &= (shading_solver.grid[idx] == shading[k])
-                    else: # trying to handle a cell off the edge
-                        if shading[k]: # we want the cell off the edge to be shaded? impossible, give up
-                            this_cond = False
-                            break
-                        # we want the cell off the edge to be unshaded? great, nothing to do, move on
-                cond |= this_cond
-        require(cond)
+        ring = [k for k, (dr,dc) in enumerate(RING_OFFSETS) if is_valid_coord(E.R, E.C, r+dr, c+dc)]
+        on_grid = sum(1 << k for k in ring)
+        masks = get_clue_masks(clue_key(clue), on_grid)
+        def shading_is(mask):
+            cond = True
+            for k in ring:
+                dr, dc = RING_OFFSETS[k]
+                cell = shading_solver.grid[r+dr][c+dc]
+                cond &= cell if mask >> k & 1 else ~cell
+            return cond
+        # either allow the shadings that match the clue, or forbid the ones
+        # that don't, whichever is the shorter list
+        if 2 * len(masks) <= 1 << len(ring):
+            cond = False # condition that this clue is fulfilled by some shading
+            for mask in masks:
+                cond |= shading_is(mask)
+            require(cond)
+        else:
+            allowed = set(masks)
+            for mask in range(256):
+                if mask & ~on_grid == 0 and mask not in allowed:
+                    require(~shading_is(mask))
     return shading_solver.solutions()
 
 def decode(solutions):
@@ -2,6 +2,9 @@ from .claspy import *
 from . import utils
 from .utils.loops import *
 from .utils.solutions import *
+import functools
+
+SYMMETRY = utils.symmetry.GenreSymmetry(solution_map = utils.symmetry.remap_loop_image)
 
 def encode(string):
     return utils.encode(string, clue_encoder = lambda s: s)
@@ -80,9 +83,13 @@ def calculate_lengths_rotated(pattern):
             start_idx = None
     return tuple(sorted(lengths.items()))
 
+@functools.lru_cache(maxsize = None)
 def get_lookup():
     '''
-    Get a 'lookup table' of sorted (length, frequency) pairs to sets of patterns.
+    Get a 'lookup table' of sorted (length, frequency) pairs to tuples of patterns.
+
+    The table is the same for every puzzle, so it's built once per process
+    and cached; don't modify it.
     '''
     all_patterns = set()
     acc_patterns(all_patterns)
@@ -91,11 +98,12 @@ def get_lookup():
     for pattern in all_patterns:
         pattern_lengths = calculate_lengths(pattern)
         if pattern_lengths in lookup:
-            lookup[pattern_lengths].add(pattern)
+            lookup[pattern_lengths].append(pattern)
         else:
-            lookup[pattern_lengths] = {pattern}
+            lookup[pattern_lengths] = [pattern]
     
-    return lookup
+    # sorted, so that the same puzzle always gets the same constraints
+    return {key: tuple(sorted(patterns)) for key, patterns in lookup.items()}
 
 # Map of 'se- c' patterns to strings based on position (tuple's 0 index is NW corner)
 POSITIONAL_SHAPES = (
@@ -137,6 +145,30 @@ def calculate_clue_counts(clue_list):
         counts[clue] = counts.get(clue, 0) + 1
     return counts
 
+def clue_key(clue_list):
+    '''
+    Returns a canonical (hashable) form of a clue:
+    its numbers in increasing order, then its ?s.
+    '''
+    numbers = sorted(clue for clue in clue_list if clue != '?')
+    return tuple(numbers) + ('?',) * (len(clue_list) - len(numbers))
+
+@functools.lru_cache(maxsize = None)
+def get_clue_keys(clue):
+    '''
+    Given a clue (as from clue_key), returns the keys of the lookup table
+    that it can stand for (with each ? replaced by a number),
+    in sorted order. Cached per clue.
+    '''
+    lookup = get_lookup()
+    clue_counts = calculate_clue_counts(clue)
+    if '?' in clue_counts:
+        possible_counts = set()
+        expand_q(possible_counts, clue_counts)
+    else:
+        possible_counts = {tuple(sorted(clue_counts.items()))}
+    return tuple(sorted(key for key in possible_counts if key in lookup))
+
 # --- end helper functions. ---
 
 def solve(E):
@@ -175,15 +207,8 @@ def solve(E):
             ((-1,-1),(-1,0),(-1,1),(0,1),(1,1),(1,0),(1,-1),(0,-1))
         ]
         condition = False # condition that this clue is fulfilled
-        clue_counts = calculate_clue_counts(clue)
-        if '?' in clue_counts:
-            possible_counts = set()
-            expand_q(possible_counts, clue_counts)
-            for key in possible_counts:
-                condition |= does_key_match_surroundings(key, adj_indices)
-        else:
-            key = tuple(sorted(clue_counts.items()))
-            condition = does_key_match_surroundings(key, adj_indices)
+        for key in get_clue_keys(clue_key(clue)):
+            condition |= does_key_match_surroundings(key, adj_indices)
         require(condition)
     return ls.solutions()
 
@@ -3,6 +3,8 @@ from .encoding import *
 from .grids import *
 from .loops import *
 from .numbers import *
+from . import profiling
 from .regions import *
 from .shading import *
 from .shapes import *
+from .symmetry import *
@@ -1,7 +1,9 @@
 from ..claspy import *
 from .grids import *
 from .solutions import *
+from .profiling import profiled
 from enum import Enum
+import collections.abc
 
 Direction = Enum('Direction', 'LEFT TOP RIGHT BOTTOM')
 DEFAULT_DIRECTIONS = {Direction.LEFT, Direction.TOP}
@@ -15,12 +17,12 @@ def get_edge_id_from_border_coord(rows, cols, i, j):
     '''
     if j % 2 == 0:
         if j//2 == cols:
-            return (i//2, j//2, Direction.RIGHT)
+            return (i//2, cols-1, Direction.RIGHT)
         else:
             return (i//2, j//2, Direction.LEFT)
     else:
         if i//2 == rows:
-            return (i//2, j//2, Direction.BOTTOM)
+            return (rows-1, j//2, Direction.BOTTOM)
         else:
             return (i//2, j//2, Direction.TOP)
                         
@@ -62,10 +64,112 @@ def get_edge_id(rows, cols, r, c, d):
         raise RuntimeError(
             "Expected 'd' to be a valid Direction enum value")
 
+class BorderPlanes(collections.abc.Set):
+    '''
+    A set of edge ids of a rows x cols grid, stored as two bit-planes
+    (one byte per grid line) instead of a set of tuples.
+
+    Behaves like the set of edge ids that `encode` builds, so it can be
+    used as an Encoding's `edges`: iterating over it gives the canonical
+    edge ids (see get_edge_id), and only those are members, as in a set of them.
+    `add` also accepts non-canonical representations
+    (e.g. `(r, c, Direction.RIGHT)` is stored as `(r, c+1, Direction.LEFT)`).
+    '''
+    __slots__ = ('__rows', '__cols', '__horizontal', '__vertical')
+
+    def __init__(self, rows, cols, edge_ids = ()):
+        self.__rows = rows
+        self.__cols = cols
+        # horizontal[r*cols + c] = the line above cell (r, c) (r = rows for the bottom edge)
+        self.__horizontal = bytearray((rows+1)*cols)
+        # vertical[r*(cols+1) + c] = the line left of cell (r, c) (c = cols for the right edge)
+        self.__vertical = bytearray(rows*(cols+1))
+        for edge_id in edge_ids:
+            self.add(edge_id)
+    @property
+    def rows(self):
+        return self.__rows
+    @property
+    def cols(self):
+        return self.__cols
+    @property
+    def horizontal(self):
+        return self.__horizontal
+    @property
+    def vertical(self):
+        return self.__vertical
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        # the results of set operations (&, |, -, ^) are plain frozensets
+        return frozenset(iterable)
+
+    def __locate(self, edge_id, canonical = False):
+        '''
+        Returns (the bit-plane, the index in it) of an edge id,
+        or (None, None) if it's not an edge of the grid
+        (or, if canonical is True, not the canonical id of one).
+        '''
+        try:
+            r, c, d = edge_id
+        except (TypeError, ValueError):
+            return None, None
+        # like the set of edge ids, only edges of cells in the grid are ever in it
+        # (e.g. (rows, c, Direction.TOP) isn't, though it's where (rows-1, c, Direction.BOTTOM) is)
+        if not (0 <= r < self.__rows and 0 <= c < self.__cols):
+            return None, None
+        if canonical and ((d == Direction.RIGHT and c != self.__cols-1) or
+                (d == Direction.BOTTOM and r != self.__rows-1)):
+            return None, None
+        if d == Direction.RIGHT:
+            c, d = c+1, Direction.LEFT
+        elif d == Direction.BOTTOM:
+            r, d = r+1, Direction.TOP
+        if d == Direction.LEFT and 0 <= r < self.__rows and 0 <= c <= self.__cols:
+            return self.__vertical, r*(self.__cols+1) + c
+        elif d == Direction.TOP and 0 <= r <= self.__rows and 0 <= c < self.__cols:
+            return self.__horizontal, r*self.__cols + c
+        return None, None
+
+    def add(self, edge_id):
+        '''
+        Adds an edge; edges outside of the grid are ignored.
+        '''
+        plane, index = self.__locate(edge_id)
+        if plane is not None:
+            plane[index] = 1
+
+    def discard(self, edge_id):
+        plane, index = self.__locate(edge_id)
+        if plane is not None:
+            plane[index] = 0
+
+    def __contains__(self, edge_id):
+        plane, index = self.__locate(edge_id, canonical = True)
+        return plane is not None and plane[index] == 1
+
+    def __iter__(self):
+        rows, cols = self.__rows, self.__cols
+        for index, bit in enumerate(self.__horizontal):
+            if bit:
+                r, c = divmod(index, cols)
+                yield (r, c, Direction.TOP) if r < rows else (r-1, c, Direction.BOTTOM)
+        for index, bit in enumerate(self.__vertical):
+            if bit:
+                r, c = divmod(index, cols+1)
+                yield (r, c, Direction.LEFT) if c < cols else (r, c-1, Direction.RIGHT)
+
+    def __len__(self):
+        return self.__horizontal.count(1) + self.__vertical.count(1)
+
+    def __repr__(self):
+        return f'BorderPlanes({self.__rows}, {self.__cols}, {sorted(self, key = lambda e: (e[0], e[1], e[2].value))})'
+
 class RectangularGridBorderSolver:
     '''
     Solves puzzles which involve the act of specifically drawing borders.
     '''
+    @profiled
     def __init__(self, rows, cols, region_solver = None):
         self.__rows = rows
         self.__cols = cols
@@ -198,6 +302,7 @@ class RectangularGridBorderSolver:
         else:
             raise RuntimeError(
                 "Expected 'd' to be a valid Direction enum value")
+    @profiled
     def loop(self, min_num_loops = 1, max_num_loops = 1):
         '''
         Add requirements to make sure that the loops present in
@@ -274,6 +379,7 @@ class RectangularGridBorderSolver:
                     (self.is_shaded(r, x, Direction.LEFT) & ~even_num_edges_encountered) | \
                         (~self.is_shaded(r, x, Direction.LEFT) & even_num_edges_encountered)
             require(even_num_edges_encountered)
+    @profiled
     def constrain_using_region_ids(self, region_id):
         '''
         Given a grid full of region IDs, of size self.rows x self.cols,
@@ -322,4 +428,5 @@ class RectangularGridBorderSolver:
                 x = x & (self.__is_shaded[edge] == self.__is_shaded[edge].value())
             require(~x)
                 
-        return get_all_solutions(generate_solution, avoid_duplicate_solution)
+        return get_all_solutions(generate_solution, avoid_duplicate_solution,
+            projection = list(self.__is_shaded.values()))
@@ -27,6 +27,84 @@ class Encoding:
         self.left_clues = left_clues
         self.left = left_clues
 
+class PackedEncoding:
+    '''
+    An Encoding of a puzzle that stores its grid in flat arrays rather than
+    in dictionaries and sets of tuples, for large puzzles.
+
+    It has the same attributes as Encoding (so solvers can use either),
+    and also:
+     - cells: a flat list of the clues, where cells[r*cols + c] is the clue
+     in cell (r, c), or None if there isn't one
+     - edges: a BorderPlanes (see borders.py) instead of a set of edge ids
+    Only the clues' representation that was given (the `clues` dictionary,
+    as from encode, or `cells`) is stored; the other one is built from it the
+    first time it is used. Assign a new value to either one to change the clues,
+    rather than modifying it in place.
+    '''
+    __slots__ = ('rows', 'cols', 'params', 'edge_ids',
+        'top_clues', 'right_clues', 'bottom_clues', 'left_clues', '__clues', '__cells')
+
+    def __init__(self, rows=None, cols=None,
+            clue_cells=None, params=None, edge_ids=None,
+            top_clues=None, right_clues=None, bottom_clues=None, left_clues=None):
+        self.rows = rows
+        self.cols = cols
+        self.clue_cells = clue_cells
+        self.params = params
+        if edge_ids is not None and not isinstance(edge_ids, BorderPlanes):
+            edge_ids = BorderPlanes(rows, cols, edge_ids)
+        self.edge_ids = edge_ids
+        self.top_clues = top_clues
+        self.right_clues = right_clues
+        self.bottom_clues = bottom_clues
+        self.left_clues = left_clues
+
+    @classmethod
+    def from_encoding(cls, E):
+        return cls(E.R, E.C, E.clues, E.params, E.edges, E.top, E.right, E.bottom, E.left)
+
+    def get_clue(self, r, c):
+        '''
+        Returns the clue in cell (r, c), or None if there isn't one.
+        '''
+        return self.cells[r*self.cols + c]
+
+    @property
+    def clue_cells(self):
+        if self.__clues is None and self.__cells is not None:
+            cols = self.cols
+            self.__clues = {divmod(index, cols): value
+                for index, value in enumerate(self.__cells) if value is not None}
+        return self.__clues
+    @clue_cells.setter
+    def clue_cells(self, clue_cells):
+        self.__clues = clue_cells
+        self.__cells = None
+
+    @property
+    def cells(self):
+        if self.__cells is None and self.__clues is not None:
+            cells = [None] * (self.rows*self.cols)
+            for (r, c), value in self.__clues.items():
+                cells[r*self.cols + c] = value
+            self.__cells = cells
+        return self.__cells
+    @cells.setter
+    def cells(self, cells):
+        self.__cells = cells
+        self.__clues = None
+
+    # the same aliases as Encoding
+    clues = clue_cells
+    r = R = property(lambda self: self.rows)
+    c = C = property(lambda self: self.cols)
+    edges = property(lambda self: self.edge_ids)
+    top = property(lambda self: self.top_clues)
+    right = property(lambda self: self.right_clues)
+    bottom = property(lambda self: self.bottom_clues)
+    left = property(lambda self: self.left_clues)
+
 def default_clue_encoder(string):
     '''
     If 'string' is a number, return its int value.
@@ -49,6 +127,34 @@ def default_clue_encoder(string):
 def grid_to_rc(i, j):
     return i//2, j//2
 
+def parse_coord(coord_str):
+    '''
+    Given a coordinate string of the input grid (e.g. '3,-1'),
+    Return the coordinate as a tuple of ints (e.g. (3, -1)),
+    or None if it isn't a coordinate string.
+    '''
+    i, sep, j = coord_str.partition(',')
+    try:
+        coord = int(i), int(j)
+    except ValueError:
+        return None
+    # only accept the canonical spelling (e.g. not '03,1'), like a lookup of f'{i},{j}' would
+    return coord if sep and f'{coord[0]},{coord[1]}' == coord_str else None
+
+def parse_grid(json_grid):
+    '''
+    Given the 'grid' of a puzzle's JSON object,
+    Return a list of (i, j, value) for each of its coordinate strings,
+    in a top-to-bottom, left-to-right order.
+    '''
+    coords = []
+    for coord_str, value in json_grid.items():
+        coord = parse_coord(coord_str)
+        if coord is not None:
+            coords.append((*coord, value))
+    coords.sort(key = lambda coord: coord[:2])
+    return coords
+
 def unquote_plus(value):
     if isinstance(value, list):
         return [unquote_plus(x) for x in value]
@@ -61,7 +167,8 @@ def encode(string,
            clue_encoder = default_clue_encoder,
            has_params = False, # currently useless 5/21/21 --michael
            has_borders = False,
-           outside_clues = '0000'):
+           outside_clues = '0000',
+           packed = False):
     '''
     Given a JSON object representing a puzzle,
     a clue_encoder function which interprets the clues' string values,
@@ -72,6 +179,7 @@ def encode(string,
      - outside_clues = a binary string which specifies the presence
      of outside clues in the perimeter, in a top, right, bottom, left
      ordering, where a 0 represents no border in that location
+     - packed = True to return a PackedEncoding instead of an Encoding
     '''
     json_obj = json.loads(string)
     
@@ -100,27 +208,8 @@ def encode(string,
             del params['n']
     
     if has_borders:
-        edge_ids = set()
+        edge_ids = BorderPlanes(rows, cols) if packed else set()
         
-    for i in range(2*(rows+1)):
-        for j in range(2*(cols+1)):
-            coord_str = f'{i},{j}'
-            if coord_str in json_grid:
-                if (i%2, j%2) == (1, 1): # cell coords
-                    if i<2*rows and j<2*cols:
-                        clue_cells[grid_to_rc(i,j)] = clue_encoder(unquote_plus(json_grid[coord_str]))
-                else: # border coords
-                    edge_ids.add(get_edge_id_from_border_coord(rows, cols, i, j))
-    
-    # add outside borders manually, just in case
-    if has_borders:
-       for r in range(rows):
-           edge_ids.add((r, 0, Direction.LEFT))
-           edge_ids.add((r, cols-1, Direction.RIGHT))
-       for c in range(cols):
-           edge_ids.add((0, c, Direction.TOP))
-           edge_ids.add((rows-1, c, Direction.BOTTOM))
-    
     outside_clue_string = json_properties['outside']
     if outside_clue_string[0] == '1':
         top_clues = {}
@@ -130,32 +219,36 @@ def encode(string,
         bottom_clues = {}
     if outside_clue_string[3] == '1':
         left_clues = {}
-        
-    if top_clues != None:
-        for j in range(2*(cols+1)):
-            input_coord_string = '{},{}'.format(-1, j)
-            if input_coord_string in json_grid:
-                top_clues[j//2] = clue_encoder(unquote_plus(json_grid[input_coord_string]))
-    
-    if right_clues != None:
-        for i in range(2*(rows+1)):
-            input_coord_string = '{},{}'.format(i, 2*cols+1)
-            if input_coord_string in json_grid:
-                right_clues[i//2] = clue_encoder(unquote_plus(json_grid[input_coord_string]))
-    
-    if bottom_clues != None:
-        for j in range(2*(cols+1)):
-            input_coord_string = '{},{}'.format(2*rows+1, j)
-            if input_coord_string in json_grid:
-                bottom_clues[j//2] = clue_encoder(unquote_plus(json_grid[input_coord_string]))
+
+    # only look at the coordinates that are actually in the input
+    # (a coordinate on the bottom / right edge can be both a border and an outside clue)
+    for i, j, value in parse_grid(json_grid):
+        in_rows, in_cols = 0 <= i <= 2*rows+1, 0 <= j <= 2*cols+1
+        if in_rows and in_cols:
+            if (i%2, j%2) == (1, 1): # cell coords
+                if i<2*rows and j<2*cols:
+                    clue_cells[grid_to_rc(i,j)] = clue_encoder(unquote_plus(value))
+            elif edge_ids != None: # border coords
+                edge_ids.add(get_edge_id_from_border_coord(rows, cols, i, j))
+        if top_clues != None and i == -1 and in_cols:
+            top_clues[j//2] = clue_encoder(unquote_plus(value))
+        if right_clues != None and j == 2*cols+1 and in_rows:
+            right_clues[i//2] = clue_encoder(unquote_plus(value))
+        if bottom_clues != None and i == 2*rows+1 and in_cols:
+            bottom_clues[j//2] = clue_encoder(unquote_plus(value))
+        if left_clues != None and j == -1 and in_rows:
+            left_clues[i//2] = clue_encoder(unquote_plus(value))
     
-    if left_clues != None:
-        for i in range(2*(rows+1)):
-            input_coord_string = '{},{}'.format(i, -1)
-            if input_coord_string in json_grid:
-                left_clues[i//2] = clue_encoder(unquote_plus(json_grid[input_coord_string]))
+    # add outside borders manually, just in case
+    if has_borders:
+       for r in range(rows):
+           edge_ids.add((r, 0, Direction.LEFT))
+           edge_ids.add((r, cols-1, Direction.RIGHT))
+       for c in range(cols):
+           edge_ids.add((0, c, Direction.TOP))
+           edge_ids.add((rows-1, c, Direction.BOTTOM))
 
-    return Encoding(rows, cols, clue_cells,
+    return (PackedEncoding if packed else Encoding)(rows, cols, clue_cells,
                 params, edge_ids,
                 top_clues, right_clues, bottom_clues, left_clues)
 
@@ -174,3 +267,38 @@ def decode(solutions):
     solution_str += f'"num_solutions":{len(solutions)}'
     solution_str += '}'
     return solution_str
+
+def get_difference(solution, other_solution):
+    '''
+    Given two solutions (dictionaries mapping coordinate strings to values),
+    Return the first coordinate (in top-to-bottom, left-to-right order)
+    where they differ, or None if they are the same.
+    '''
+    def order(coord):
+        return tuple(map(int, coord.split(',')))
+    for coord in sorted(set(solution) | set(other_solution), key = order):
+        if solution.get(coord) != other_solution.get(coord):
+            return coord
+    return None
+
+def decode_uniqueness(solutions, decode_function = decode):
+    '''
+    Given the (at most 2) solutions found by a uniqueness check,
+    Return a string of the format:
+        {
+            1: (the first solution, if there is one),
+            'num_solutions': (0 or 1),
+            'uniqueness': ('none', 'unique', or 'multiple'),
+            'difference': (if 'multiple', a cell where the second solution differs:
+                {'coord': ..., 'first': ..., 'second': ...}),
+        }.
+    Only the first solution is formatted (with decode_function).
+    '''
+    solution_str = decode_function(solutions[:1])
+    uniqueness = {'uniqueness': ['none', 'unique', 'multiple'][min(len(solutions), 2)]}
+    if len(solutions) > 1 and isinstance(solutions[0], dict):
+        coord = get_difference(solutions[0], solutions[1])
+        if coord is not None:
+            uniqueness['difference'] = {'coord': coord,
+                'first': solutions[0].get(coord), 'second': solutions[1].get(coord)}
+    return solution_str[:-1] + ',' + json.dumps(uniqueness)[1:]
@@ -1,4 +1,7 @@
+from ..claspy import BoolVar, IntVar, Atom
 from enum import Enum
+import functools
+import inspect
 
 Type = Enum('Type', 'RECT HEX')
 
@@ -10,55 +13,190 @@ def is_valid_coord(rows, cols, r, c):
     '''
     return 0 <= r < rows and 0 <= c < cols
 
+# (dr, dc) offsets of the cells around a cell, in the order they are returned in
+ORTHOGONAL_OFFSETS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+DIAGONAL_OFFSETS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+KING_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+
+# the geometry of a grid only depends on its dimensions, so the tables below
+# are built once per (rows, cols) and shared by every puzzle this process solves
+TABLE_CACHE_SIZE = 64
+
+@functools.lru_cache(maxsize = TABLE_CACHE_SIZE)
+def get_coord_table(rows, cols):
+    '''
+    Given puzzle dimensions (rows, cols),
+
+    Returns a table (a tuple of tuples) where table[r][c] == (r, c),
+    so that the other tables can share the same coordinate tuples.
+    '''
+    return tuple(tuple((r, c) for c in range(cols)) for r in range(rows))
+
+@functools.lru_cache(maxsize = TABLE_CACHE_SIZE)
+def get_adjacency_table(rows, cols, offsets):
+    '''
+    Given puzzle dimensions (rows, cols), and a tuple of (dr, dc) offsets,
+
+    Returns a table where table[r][c] is a tuple of the valid coordinates
+    (r+dr, c+dc), in the order of the offsets.
+    '''
+    coords = get_coord_table(rows, cols)
+    return tuple(tuple(tuple(coords[r+dr][c+dc] for (dr, dc) in offsets
+                if is_valid_coord(rows, cols, r+dr, c+dc))
+            for c in range(cols)) for r in range(rows))
+
+@functools.lru_cache(maxsize = TABLE_CACHE_SIZE)
+def get_ray_table(rows, cols):
+    '''
+    Given puzzle dimensions (rows, cols),
+
+    Returns a table where table[r][c] is a tuple of 4 rays (up, down, left, right),
+    each of which is a tuple of the coordinates from (r, c) (exclusive)
+    to the edge of the grid, in order of distance.
+    '''
+    coords = get_coord_table(rows, cols)
+    return tuple(tuple((
+                tuple(coords[y][c] for y in range(r-1, -1, -1)),
+                tuple(coords[y][c] for y in range(r+1, rows)),
+                tuple(coords[r][x] for x in range(c-1, -1, -1)),
+                tuple(coords[r][x] for x in range(c+1, cols)),
+            ) for c in range(cols)) for r in range(rows))
+
+def get_offset_cells(rows, cols, r, c, offsets):
+    '''
+    Given puzzle dimensions (rows, cols), a specific (r, c) coordinate,
+    and a tuple of (dr, dc) offsets,
+
+    Returns a tuple of the valid coordinates (r+dr, c+dc).
+    '''
+    if is_valid_coord(rows, cols, r, c):
+        return get_adjacency_table(rows, cols, offsets)[r][c]
+    # (r, c) is outside of the grid, so it isn't in the table
+    return tuple((r+dr, c+dc) for (dr, dc) in offsets if is_valid_coord(rows, cols, r+dr, c+dc))
+
 def get_neighbors(rows, cols, r, c):
     '''
     Given puzzle dimensions (rows, cols), and a specific (r, c) coordinate,
     
     Returns the 90-degree neighbors of (r, c).
     '''
-    neighbors = []
-    for (y, x) in ((r-1, c), (r+1, c), (r, c-1), (r, c+1)):
-        if is_valid_coord(rows, cols, y, x):
-            neighbors.append((y, x))
-    return neighbors
+    return get_offset_cells(rows, cols, r, c, ORTHOGONAL_OFFSETS)
     
 def get_surroundings(rows, cols, r, c):
     '''
     Given puzzle dimensions (rows, cols), and a specific (r, c) coordinate,
     
-    Returns the surroundings (includes diagonals) of (r, c).
+    Returns the surroundings (includes diagonals) of (r, c),
+    i.e. the cells a king can move to.
+    '''
+    return get_offset_cells(rows, cols, r, c, KING_OFFSETS)
+
+def get_diagonals(rows, cols, r, c):
+    '''
+    Given puzzle dimensions (rows, cols), and a specific (r, c) coordinate,
+    
+    Returns the diagonal neighbors of (r, c).
     '''
-    surroundings = []
-    for y in range(r-1, r+2):
-        for x in range(c-1, c+2):
-            if (y, x) != (r, c) and is_valid_coord(rows, cols, y, x):
-                surroundings.append((y, x))
-    return surroundings
+    return get_offset_cells(rows, cols, r, c, DIAGONAL_OFFSETS)
+
+def get_knight_moves(rows, cols, r, c):
+    '''
+    Given puzzle dimensions (rows, cols), and a specific (r, c) coordinate,
+    
+    Returns the cells that are a knight's move away from (r, c).
+    '''
+    return get_offset_cells(rows, cols, r, c, KNIGHT_OFFSETS)
+
+def get_rays(rows, cols, r, c):
+    '''
+    Given puzzle dimensions (rows, cols), and a specific (r, c) coordinate,
+    
+    Returns the 4 rays (up, down, left, right) from (r, c) to the edges of the grid
+    (see get_ray_table).
+    '''
+    return get_ray_table(rows, cols)[r][c]
 
 def manhattan_distance(r1c1, r2c2):
     return abs(r1c1[0]-r2c2[0]) + abs(r1c1[1]-r2c2[1])
 
+def takes_coords(seed_function):
+    '''
+    Returns True iff seed_function must be called with a cell's (r, c) coordinates
+    (i.e. it has at least 2 required positional parameters).
+    '''
+    try:
+        parameters = inspect.signature(seed_function).parameters.values()
+    except (TypeError, ValueError): # e.g. some builtins
+        return False
+    required = [p for p in parameters if p.default is p.empty and
+        p.kind in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)]
+    return len(required) >= 2
+
 class RectangularGrid:
     '''
     Represents a puzzle as a list of lists, where each internal list
     represents a row of the puzzle.
     
     Each cell is of the same type as all the others.
+
+    The cells are stored in a single flat tuple (see `cells`), and each row
+    in a tuple of its own, sliced from it once when the grid is built;
+    grid[r][c], grid[r, c], grid[r] and grid[r1:r2] index into the rows
+    without copying anything. The rows hold references to the same cells
+    as the flat tuple, so the grid takes two references per cell.
     '''
+    __slots__ = ('__rows', '__cols', '__cells', '__row_views')
+
     def __init__(self, rows, cols, seed_function):
         '''
         rows = # rows
         cols = # columns
         seed_function = a function which, when called, yields a value
         of the appropriate type for this puzzle
+        (it is called with the cell's (r, c) coordinates if it takes 2 parameters)
         '''
+        if takes_coords(seed_function):
+            cells = [seed_function(r, c) for r in range(rows) for c in range(cols)]
+        else:
+            cells = [seed_function() for i in range(rows*cols)]
+        self.__set_cells(rows, cols, cells)
+
+    def __set_cells(self, rows, cols, cells):
         self.__rows = rows
         self.__cols = cols
-        self.__type = Type.RECT
-        try:
-            self.__grid = [[seed_function() for c in range(cols)] for r in range(rows)]
-        except:
-            self.__grid = [[seed_function(r,c) for c in range(cols)] for r in range(rows)]
+        self.__cells = tuple(cells)
+        self.__row_views = tuple(self.__cells[r*cols:(r+1)*cols] for r in range(rows))
+
+    @classmethod
+    def from_cells(cls, rows, cols, cells):
+        '''
+        Returns a grid whose cells (in top-to-bottom, left-to-right order) are `cells`.
+        '''
+        if len(cells) != rows*cols:
+            raise ValueError(f'A {rows}x{cols} grid needs {rows*cols} cells, not {len(cells)}.')
+        grid = cls.__new__(cls)
+        grid.__set_cells(rows, cols, cells)
+        return grid
+    @classmethod
+    def of_bools(cls, rows, cols):
+        '''
+        Returns a grid of new BoolVars.
+        '''
+        return cls.from_cells(rows, cols, [BoolVar() for i in range(rows*cols)])
+    @classmethod
+    def of_atoms(cls, rows, cols):
+        '''
+        Returns a grid of new Atoms.
+        '''
+        return cls.from_cells(rows, cols, [Atom() for i in range(rows*cols)])
+    @classmethod
+    def of_ints(cls, rows, cols, lo, hi):
+        '''
+        Returns a grid of new IntVars with values in [lo, hi].
+        '''
+        return cls.from_cells(rows, cols, [IntVar(lo, hi) for i in range(rows*cols)])
+
     @property
     def rows(self):
         return self.__rows
@@ -67,12 +205,21 @@ class RectangularGrid:
         return self.__cols
     @property
     def type(self):
-        return self.__type
+        return Type.RECT
+    @property
+    def cells(self):
+        '''
+        All of the cells, as a flat tuple in top-to-bottom, left-to-right order
+        (cells[r*cols + c] is the cell at (r, c)).
+        '''
+        return self.__cells
     def __getitem__(self, key):
-        if type(key) == tuple:
-            return self.__grid[key[0]][key[1]]
+        if key.__class__ is tuple:
+            return self.__row_views[key[0]][key[1]]
         else:
-            return self.__grid[key]
+            return self.__row_views[key]
+    def __iter__(self):
+        return iter(self.__row_views)
     def __len__(self):
         return self.__rows
     def is_valid_coord(self, r, c):
@@ -90,6 +237,21 @@ class RectangularGrid:
         Returns the surroundings (includes diagonals) of (r, c) in this grid.
         '''
         return get_surroundings(self.rows, self.cols, r, c)
+    def get_diagonals(self, r, c):
+        '''
+        Returns the diagonal neighbors of (r, c) in this grid.
+        '''
+        return get_diagonals(self.rows, self.cols, r, c)
+    def get_knight_moves(self, r, c):
+        '''
+        Returns the cells a knight's move away from (r, c) in this grid.
+        '''
+        return get_knight_moves(self.rows, self.cols, r, c)
+    def get_rays(self, r, c):
+        '''
+        Returns the 4 rays (up, down, left, right) from (r, c) to the edges of this grid.
+        '''
+        return get_rays(self.rows, self.cols, r, c)
 
     def iter_coords(self):
         for r in range(self.rows):
@@ -2,6 +2,7 @@ from ..claspy import *
 from .grids import *
 from .solutions import *
 from .encoding import *
+from .profiling import profiled
 
 # --- ISOLATED CELL PATTERNS ---
 ISOLATED = ['.', '']
@@ -59,6 +60,7 @@ class RectangularGridLoopSolver:
     
     Is always a "main" solver (is never "auxiliary").
     '''
+    @profiled
     def __init__(self,
             rows,
             cols,
@@ -110,6 +112,7 @@ class RectangularGridLoopSolver:
     @property
     def loop_id(self):
         return self.__loop_id
+    @profiled
     def loop(self,
              clue_cells,
              includes_clues = False,
@@ -453,6 +456,7 @@ class RectangularGridLoopSolver:
         require(at_least(self.min_num_loops, is_loop_start))
         require(at_most(self.max_num_loops, is_loop_start))
         
+    @profiled
     def no_reentrance(self, regions):
         '''
         Given a set of regions (where each region is composed of (r, c) coordinate tuples),
@@ -498,6 +502,7 @@ class RectangularGridLoopSolver:
                 # we should have either 0 outside connections (loop doesn't hit this region) or 2 outside connections (in/out)
                 require(num_outside_connections < 3)
 
+    @profiled
     def hit_every_region(self, regions, every_loop = False):
         '''
         Given a set of regions (where each region is composed of (r, c) coordinate tuples),
@@ -516,6 +521,7 @@ class RectangularGridLoopSolver:
                 # every region must have at least one non-isolated pattern
                 require(at_least(1, [~var_in(self.grid[r][c], ISOLATED) for (r, c) in region]))
         
+    @profiled
     def inside(self, coords):
         '''
         Given a collection of (r, c) coordinates, force all of them to be inside.
@@ -528,6 +534,7 @@ class RectangularGridLoopSolver:
             require(var_in(self.grid[r][c], ISOLATED))
             require(is_inside)
 
+    @profiled
     def outside(self, coords):
         '''
         Given a collection of (r, c) coordinates, force all of them to be outside.
@@ -2,6 +2,7 @@ from ..claspy import *
 from .grids import *
 from .solutions import *
 from .encoding import *
+from .profiling import profiled
 
 def factor_pairs(n):
     '''
@@ -17,6 +18,7 @@ class RectangularGridNumbersSolver:
     '''
     Solves puzzles which require writing a number in each cell.
     '''
+    @profiled
     def __init__(self, rows, cols, min_value, max_value):
         '''
         rows = # rows
@@ -26,7 +28,7 @@ class RectangularGridNumbersSolver:
         '''
         self.__rows = rows
         self.__cols = cols
-        self.__grid = RectangularGrid(rows, cols, lambda : IntVar(min_value, max_value))
+        self.__grid = RectangularGrid.of_ints(rows, cols, min_value, max_value)
     @property
     def rows(self):
         return self.__rows
@@ -36,6 +38,7 @@ class RectangularGridNumbersSolver:
     @property
     def grid(self):
         return self.__grid
+    @profiled
     def regions(self, regions):
         '''
         Given a collection of regions, where each region consists of
@@ -46,6 +49,7 @@ class RectangularGridNumbersSolver:
         for region in regions:
             cells_in_region = [self.grid[r][c] for (r, c) in region]
             require_all_diff(cells_in_region)
+    @profiled
     def rows_and_cols(self):
         '''
         Require that the cells in every row are distinct,
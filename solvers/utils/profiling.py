@@ -0,0 +1,176 @@
+'''
+Lightweight per-solve profiling (requested with `?profile=1`; see noq/workers.py).
+
+While a profile is active (between start_profile and stop_profile),
+`with phase(name):` blocks and functions decorated with @profiled add the
+number of calls and the time spent in them to it; otherwise they only
+check that no profile is active. Times are inclusive, so a phase that
+runs inside another one (e.g. `clasp` inside a solver's `solutions`)
+is counted in both.
+
+Each phase also records how much it grew the claspy problem: the number
+of variables (claspy's boolean literals, which includes Atoms and the
+bits of IntVars / MultiVars) and of rules that were created inside it.
+This shows which constraint builder an encoding's size comes from.
+
+A profile can also run cProfile over the whole solve and dump the
+result as a pstats file, for offline analysis with `python -m pstats`.
+'''
+import cProfile
+import functools
+import time
+
+from .. import claspy
+
+# the profile of the solve that's currently running, or None
+active_profile = None
+
+class Profile:
+    '''
+    The phases, counters (and optionally cProfile stats) of a single solve.
+    '''
+    def __init__(self, pstats_path = None):
+        '''
+        pstats_path = where to dump cProfile's stats when the profile stops
+        (None to not run cProfile)
+        '''
+        self.phases = {} # name -> [# calls, total seconds, # variables created, # rules created]
+        self.counters = {} # name -> count
+        self.pstats_path = pstats_path
+        self.__cprofile = cProfile.Profile() if pstats_path else None
+
+    def add(self, name, seconds, calls = 1, num_vars = 0, num_rules = 0):
+        if name not in self.phases:
+            self.phases[name] = [0, 0.0, 0, 0]
+        phase_stats = self.phases[name]
+        phase_stats[0] += calls
+        phase_stats[1] += seconds
+        phase_stats[2] += num_vars
+        phase_stats[3] += num_rules
+
+    def count(self, name, n = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def start(self):
+        if self.__cprofile is not None:
+            self.__cprofile.enable()
+
+    def stop(self):
+        if self.__cprofile is not None:
+            self.__cprofile.disable()
+            self.__cprofile.dump_stats(self.pstats_path)
+            self.__cprofile = None
+
+    def merge(self, other):
+        '''
+        Adds the phases and counters of another profile (a Profile, or its to_dict()) to this one.
+        '''
+        if isinstance(other, Profile):
+            other = other.to_dict()
+        for name, phase_stats in other.get('phases', {}).items():
+            self.add(name, phase_stats['ms'] / 1000, phase_stats['calls'],
+                phase_stats.get('vars', 0), phase_stats.get('rules', 0))
+        for name, n in other.get('counters', {}).items():
+            self.count(name, n)
+        if other.get('pstats'):
+            self.pstats_path = other['pstats']
+
+    def to_dict(self):
+        '''
+        Returns the profile as JSON-serializable data:
+            {'phases': {name: {'calls': ..., 'ms': ..., 'vars': ..., 'rules': ...}},
+             'counters': {...}, 'pstats': path}
+        with the phases in the order they first finished.
+        '''
+        profile = {
+            'phases': {name: {'calls': calls, 'ms': round(1000 * seconds, 3), 'vars': num_vars, 'rules': num_rules}
+                for name, (calls, seconds, num_vars, num_rules) in self.phases.items()},
+            'counters': dict(self.counters),
+        }
+        if self.pstats_path:
+            profile['pstats'] = self.pstats_path
+        return profile
+
+def start_profile(pstats_path = None):
+    '''
+    Starts profiling the current solve, and returns its Profile.
+    '''
+    global active_profile
+    active_profile = Profile(pstats_path)
+    active_profile.start()
+    return active_profile
+
+def stop_profile():
+    '''
+    Stops profiling, and returns the Profile (or None if there wasn't one).
+    '''
+    global active_profile
+    profile, active_profile = active_profile, None
+    if profile is not None:
+        profile.stop()
+    return profile
+
+def problem_size():
+    '''
+    Returns the current size of the claspy problem: (# variables, # rules).
+    '''
+    return claspy.last_bool, len(claspy.clasp_rules)
+
+def growth(before, after):
+    '''
+    Given two problem_size()s, returns (# variables, # rules) created in between.
+    (If claspy was reset in between, everything after the reset counts.)
+    '''
+    if after[0] < before[0] or after[1] < before[1]:
+        return after
+    return after[0] - before[0], after[1] - before[1]
+
+def count(name, n = 1):
+    '''
+    Adds n to a counter of the active profile, if there is one.
+    '''
+    if active_profile is not None:
+        active_profile.count(name, n)
+
+class phase:
+    '''
+    A context manager that adds the time spent in its block to the active profile:
+        with phase('ground'):
+            ...
+    '''
+    __slots__ = ('name', 'start', 'size')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if active_profile is not None:
+            self.size = problem_size()
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if active_profile is not None and self.start is not None:
+            seconds = time.perf_counter() - self.start
+            active_profile.add(self.name, seconds, 1, *growth(self.size, problem_size()))
+        return False
+
+def profiled(function):
+    '''
+    A decorator that adds the time spent in a function (or method), and the
+    variables and rules it creates, to the active profile, under the function's
+    qualified name (e.g. 'RectangularGridShadingSolver.white_connectivity').
+    '''
+    name = function.__qualname__
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if active_profile is None:
+            return function(*args, **kwargs)
+        profile, size, start = active_profile, problem_size(), time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            profile.add(name, seconds, 1, *growth(size, problem_size()))
+    return wrapper
@@ -2,6 +2,132 @@ from ..claspy import *
 from .borders import *
 from .grids import *
 from .solutions import *
+from .profiling import profiled
+
+class RegionLabels:
+    '''
+    The regions (rooms) of a grid that is divided by borders,
+    as found by label_regions.
+
+    Each cell's region is stored in the flat list `region_id`
+    (region_id[r*cols + c] is the region of cell (r, c)); regions are
+    numbered 0, 1, ... in the order of their first cell (top-to-bottom,
+    left-to-right). The frozenset of a region's cells is only built
+    when it is asked for.
+    '''
+    __slots__ = ('__rows', '__cols', '__region_id', '__num_regions', '__members', '__rooms')
+
+    def __init__(self, rows, cols, region_id, num_regions):
+        self.__rows = rows
+        self.__cols = cols
+        self.__region_id = region_id
+        self.__num_regions = num_regions
+        self.__members = None # region -> list of flat cell indices
+        self.__rooms = {} # region -> frozenset of (r, c) coordinates
+    @property
+    def rows(self):
+        return self.__rows
+    @property
+    def cols(self):
+        return self.__cols
+    @property
+    def region_id(self):
+        return self.__region_id
+    @property
+    def num_regions(self):
+        return self.__num_regions
+
+    def __len__(self):
+        return self.__num_regions
+
+    def get_region_id(self, r, c):
+        return self.__region_id[r*self.__cols + c]
+
+    def region(self, region_id):
+        '''
+        Returns the frozenset of the (r, c) coordinates of the cells in a region.
+        '''
+        if region_id not in self.__rooms:
+            if self.__members is None:
+                self.__members = [[] for i in range(self.__num_regions)]
+                for index, cell_region in enumerate(self.__region_id):
+                    self.__members[cell_region].append(index)
+            cols = self.__cols
+            self.__rooms[region_id] = frozenset(divmod(index, cols) for index in self.__members[region_id])
+        return self.__rooms[region_id]
+
+    def region_of(self, r, c):
+        '''
+        Returns the frozenset of the coordinates of the cells in the region of (r, c).
+        '''
+        return self.region(self.get_region_id(r, c))
+
+    def regions(self):
+        '''
+        Returns a set of frozensets, where each frozenset contains the (r, c)
+        coordinates of an entire region.
+        '''
+        return {self.region(region_id) for region_id in range(self.__num_regions)}
+
+@profiled
+def label_regions(rows, cols, borders):
+    '''
+    Given puzzle dimensions (rows, cols) and the borders that divide the grid
+    (a collection of edge ids, or a BorderPlanes),
+
+    Returns the RegionLabels of the grid's regions, found with a
+    union-find over the cells in a single pass.
+
+    Raises ValueError if a border has the same region on both sides.
+    '''
+    if not isinstance(borders, BorderPlanes) or (borders.rows, borders.cols) != (rows, cols):
+        borders = BorderPlanes(rows, cols, borders)
+    horizontal, vertical = borders.horizontal, borders.vertical
+
+    # every cell starts out as its own region; the root of a region is its first cell
+    parent = list(range(rows*cols))
+    def find(index):
+        root = index
+        while parent[root] != root:
+            root = parent[root]
+        while parent[index] != root:
+            parent[index], index = root, parent[index]
+        return root
+    def union(a, b):
+        a, b = find(a), find(b)
+        if a < b:
+            parent[b] = a
+        elif b < a:
+            parent[a] = b
+
+    for r in range(rows):
+        for c in range(cols):
+            index = r*cols + c
+            # join the cell to its right / bottom neighbor, unless there is a border in between
+            if c+1 < cols and not vertical[r*(cols+1) + c+1]:
+                union(index, index+1)
+            if r+1 < rows and not horizontal[index+cols]:
+                union(index, index+cols)
+
+    # number the regions in the order of their first cell
+    region_id = [0] * (rows*cols)
+    root_to_id = {}
+    for index in range(rows*cols):
+        region_id[index] = root_to_id.setdefault(find(index), len(root_to_id))
+
+    # check that there are no stranded edges
+    for r in range(rows):
+        for c in range(1, cols):
+            index = r*cols + c
+            if vertical[r*(cols+1) + c] and region_id[index-1] == region_id[index]:
+                raise ValueError('There is a dead-end edge.')
+    for r in range(1, rows):
+        for c in range(cols):
+            index = r*cols + c
+            if horizontal[index] and region_id[index-cols] == region_id[index]:
+                raise ValueError('There is a dead-end edge.')
+
+    return RegionLabels(rows, cols, region_id, len(root_to_id))
 
 def full_bfs(rows, cols, borders, clues = None):
     '''
@@ -12,106 +138,21 @@ def full_bfs(rows, cols, borders, clues = None):
         if clues were provided:
             a dictionary mapping each clue cell to a frozenset of
                 the (r, c) coordinates of the room that the clue is in
-            (if a room has no clue cells, it gets ignored)
+            (if a room has no clue cells, it gets ignored;
+            if it has several, only the first one is used)
         else:
             a set of frozensets, where each frozenset contains the (r, c)
                 coordinates of an entire room
-    '''
-    # initially, all cells are unexplored
-    unexplored_cells = {(r,c) for c in range(cols) for r in range(rows)}
-    
-    # build a set of rooms
-    # (if there are clues, we need this for stranded-edge checks)
-    room_set = set()
-    if clues:
-        # build a mapping of (clue cell coordinate): {the entire room}
-        clue_to_room = {}
-        
-    # --- HELPER METHOD FOR full_bfs---
-    def bfs(start_cell):
-        # find the clue cell in this room
-        clue_cell = None
-        # keep track of which cells are in this connected component
-        connected_component = {start_cell}
 
-        # the start cell has now been explored
-        unexplored_cells.remove(start_cell)
-        
-        # bfs!
-        frontier = {start_cell}
-        while frontier:
-            new_frontier = set()
-            for (r,c) in frontier:
-                # build a set of coordinates that are not divided by borders
-                # (they don't have to be part of the grid;
-                # we'll check for membership / validity later)
-                neighbors = set()
-                if (r, c, Direction.LEFT) not in borders:
-                    neighbors.add((r,c-1))
-                if get_edge_id(rows, cols, r, c, Direction.RIGHT) not in borders:
-                    neighbors.add((r,c+1))
-                if (r, c, Direction.TOP) not in borders:
-                    neighbors.add((r-1,c))
-                if get_edge_id(rows, cols, r, c, Direction.BOTTOM) not in borders:
-                    neighbors.add((r+1,c))
-                # find the clue cell
-                if clues != None and (r, c) in clues:
-                    clue_cell = (r,c)
-                # for each neighbor that is a valid grid cell and not in this
-                # connected component:
-                for neighbor in neighbors:
-                    if neighbor in unexplored_cells:
-                        connected_component.add(neighbor)
-                        unexplored_cells.remove(neighbor)
-                        new_frontier.add(neighbor)
-            frontier = new_frontier
-        return clue_cell, frozenset(connected_component)
-        
-    while len(unexplored_cells) != 0:
-        # get a random start cell
-        iterator = iter(unexplored_cells)
-        start_cell = next(iterator)
-        # run bfs on that connected component
-        clue, room = bfs(start_cell)
-        # add the room to the room-set
-        room_set.add(room)
-        if clue != None:
-            clue_to_room[clue] = room
-    
-    # --- HELPER METHOD FOR FINDING WHICH ROOM A CELL BELONGS TO ---
-    def get_room(r, c):
-        for room in room_set:
-            if (r, c) in room:
-                return room
-    
-    # check that there are no stranded edges
-    for r, c, d in borders:
-        if d == Direction.LEFT:
-            # if there is a left neighbor
-            if is_valid_coord(rows, cols, r, c-1):
-                room = get_room(r, c)
-                # make sure it's not in the same room
-                if (r, c-1) in room:
-                    raise ValueError('There is a dead-end edge.')
-        elif d == Direction.TOP:
-            if is_valid_coord(rows, cols, r-1, c):
-                room = get_room(r, c)
-                if (r-1, c) in room:
-                    raise ValueError('There is a dead-end edge.')
-        elif d == Direction.RIGHT:
-            if is_valid_coord(rows, cols, r, c+1):
-                room = get_room(r, c)
-                if (r, c+1) in room:
-                    raise ValueError('There is a dead-end edge.')
-        elif d == Direction.BOTTOM:
-            if is_valid_coord(rows, cols, r+1, c):
-                room = get_room(r, c)
-                if (r+1, c) in room:
-                    raise ValueError('There is a dead-end edge.')
-                    
+    (See label_regions, which this is a wrapper around.)
+    '''
+    labels = label_regions(rows, cols, borders)
     if clues:
-        return clue_to_room
-    return room_set
+        region_to_clue = {}
+        for (r, c) in clues:
+            region_to_clue.setdefault(labels.get_region_id(r, c), (r, c))
+        return {clue: labels.region(region_id) for region_id, clue in region_to_clue.items()}
+    return labels.regions()
 
 class RectangularGridRegionSolver:
     '''
@@ -122,6 +163,7 @@ class RectangularGridRegionSolver:
     
     Can be a "main" or "auxiliary" solver.
     '''
+    @profiled
     def __init__(self, rows, cols, grid = None, given_regions = None, max_num_regions = None,
         region_symbol_sets = None, nonregion_area_connected = False):
         '''
@@ -162,7 +204,7 @@ class RectangularGridRegionSolver:
                 region_symbol_sets = []
                 for i in range(max_num_regions):
                     region_symbol_sets.append([i])
-            self.__grid = RectangularGrid(rows, cols, lambda : IntVar(0, max_num_regions-1))
+            self.__grid = RectangularGrid.of_ints(rows, cols, 0, max_num_regions-1)
         if given_regions == None:
             if max_num_regions == None or region_symbol_sets == None:
                 raise ValueError('If a grid is being provided and regions are not being provided, max # regions and symbol sets must be provided')
@@ -203,6 +245,7 @@ class RectangularGridRegionSolver:
         return same_region_symbol
     
     # --- METHODS FOR PUZZLES IN WHICH REGIONS NOT PROVIDED AS PART OF INPUT ---
+    @profiled
     def make_regions(self, max_num_regions, region_symbol_sets, nonregion_area_connected):
         '''
         Apply constraints that ensure that there at most max_num_regions,
@@ -293,6 +336,7 @@ class RectangularGridRegionSolver:
                 (self.__parent[r][c] == '.') \
                 for r in range(self.rows) for c in range(self.cols)]))
 
+    @profiled
     def set_region_size(self, max_region_size, clue_cells, min_region_size = 0, clue_region_bijection = False):
         '''
         Require that the maximum region size <= max_region_size,
@@ -353,6 +397,7 @@ class RectangularGridRegionSolver:
                     if (r, c) in clue_cells:
                         require(self.__region_size[r][c] == clue_cells[(r, c)])
 
+    @profiled
     def region_roots(self, region_root_to_id, region_symbol_set = None, exact = False,
         unassigned_region_id_constraint = None):
         '''
@@ -417,6 +462,7 @@ class RectangularGridRegionSolver:
             [self.__region_id[r][c] != self.__region_id[y][x] for (y, x) in neighbors]))
     
     # --- METHODS FOR PUZZLES IN WHICH REGIONS ARE PART OF THE INPUT ---
+    @profiled
     def set_shaded_cells_in_region(self, clues, shading_symbols):
         '''
         Given a dictionary mapping (r, c) coordinates to clue values
@@ -431,6 +477,7 @@ class RectangularGridRegionSolver:
             ]
             require(sum_bools(clues[(r,c)], shaded_room_cells))
     
+    @profiled
     def set_unshaded_cells_in_region(self, clues, shading_symbols):
         '''
         Given a dictionary mapping (r, c) coordinates to clue values
@@ -537,4 +584,10 @@ class RectangularGridRegionSolver:
                     )
             require(~x)
 
-        return get_all_solutions(generate_solution, avoid_duplicate_solution)
+        # solutions are told apart by which neighboring cells are in the same region
+        projection = [self.__region_id[r][c+1] == self.__region_id[r][c]
+            for r in range(self.rows) for c in range(self.cols-1)] + \
+            [self.__region_id[r+1][c] == self.__region_id[r][c]
+            for r in range(self.rows-1) for c in range(self.cols)]
+
+        return get_all_solutions(generate_solution, avoid_duplicate_solution, projection = projection)
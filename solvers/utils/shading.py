@@ -2,6 +2,7 @@ from ..claspy import *
 from .solutions import *
 from .encoding import *
 from .grids import *
+from .profiling import profiled
 
 class RectangularGridShadingSolver():
     '''
@@ -9,6 +10,7 @@ class RectangularGridShadingSolver():
     
     Can be either "main" or "auxiliary".
     '''
+    @profiled
     def __init__(self, rows, cols, grid = None, shading_symbols = None):
         '''
         rows = # rows of the puzzle
@@ -18,8 +20,9 @@ class RectangularGridShadingSolver():
         '''
         self.__rows = rows
         self.__cols = cols
-        self.__grid = grid or RectangularGrid(rows, cols, BoolVar)
+        self.__grid = grid or RectangularGrid.of_bools(rows, cols)
         self.__shading_symbols = shading_symbols.copy() if shading_symbols else [True]
+        self.__visibility = {} # (r, c, direction) -> chain of BoolVars, see visibility
     @property
     def rows(self):
         return self.__rows
@@ -33,6 +36,7 @@ class RectangularGridShadingSolver():
     def shading_symbols(self):
         return self.__shading_symbols
 
+    @profiled
     def avoid_pattern(self, pattern):
         '''
         Require that no subsquare of the grid matches the given shading pattern.
@@ -65,6 +69,7 @@ class RectangularGridShadingSolver():
         '''
         self.avoid_pattern([[1,1],[1,1]])
                         
+    @profiled
     def no_adjacent(self):
         '''
         Require that shaded cells are not 90-degree next to each other.
@@ -72,6 +77,7 @@ class RectangularGridShadingSolver():
         self.avoid_pattern([[1,1]])
         self.avoid_pattern([[1],[1]])
                         
+    @profiled
     def no_surrounding(self):
         '''
         Require that shaded cells are not adjacent (including diagonals)
@@ -82,6 +88,39 @@ class RectangularGridShadingSolver():
         self.avoid_pattern([[1,'*'],['*',1]])
         self.avoid_pattern([['*',1],[1,'*']])
                         
+    @profiled
+    def visibility(self, r, c, limit = None):
+        '''
+        Returns the cells that (r, c) can see in each direction: the unshaded
+        cells before the first shaded cell (or the edge of the grid).
+
+        The result is 4 lists of BoolVars (up, down, left, right, as in get_rays);
+        the k-th BoolVar of a direction is true iff the first k cells in that
+        direction are all unshaded, so the number of true BoolVars is the
+        number of cells seen in that direction (e.g. for a sum_bools).
+
+        limit = the # of cells to look at in each direction (None for all of them);
+        enough to tell whether fewer than `limit` cells are seen
+
+        Each BoolVar is the previous one & the next cell being unshaded, so a
+        direction costs one BoolVar per cell, and every call for the same cell
+        and direction shares the same chain. Chains of different cells aren't
+        shared, even on the same row or column: one that starts further along
+        has no BoolVar in common with this one (sharing them would take one
+        for every start cell and length, which is quadratic per row again).
+        '''
+        rays = self.grid.get_rays(r, c)
+        visibility = []
+        for direction, ray in enumerate(rays):
+            chain = self.__visibility.setdefault((r, c, direction), [])
+            length = len(ray) if limit is None else min(limit, len(ray))
+            for (y, x) in ray[len(chain):length]:
+                unshaded = ~var_in(self.grid[y][x], self.__shading_symbols)
+                chain.append(chain[-1] & unshaded if chain else unshaded)
+            visibility.append(chain[:length])
+        return visibility
+
+    @profiled
     def white_clues(self, clue_cells):
         '''
         Require that clue cells are not shaded.
@@ -89,11 +128,12 @@ class RectangularGridShadingSolver():
         for (r, c) in clue_cells:
             require(~var_in(self.grid[r][c], self.__shading_symbols))
             
+    @profiled
     def white_connectivity(self, known_root = None):
         '''
         Require that white cells are connected.
         '''
-        connectivity_grid = RectangularGrid(self.rows, self.cols, Atom)
+        connectivity_grid = RectangularGrid.of_atoms(self.rows, self.cols)
         if known_root:
             connectivity_grid[known_root[0]][known_root[1]].prove_if(True)
             for r in range(self.rows):
@@ -104,7 +144,7 @@ class RectangularGridShadingSolver():
                                 connectivity_grid[y][x])
                     require(connectivity_grid[r][c] | var_in(self.grid[r][c], self.__shading_symbols))
         else:
-            chosen = RectangularGrid(self.rows, self.cols, BoolVar)
+            chosen = RectangularGrid.of_bools(self.rows, self.cols)
             for r in range(self.rows):
                 for c in range(self.cols):
                     # This part should happen regardless of neighbors, although it's only relevant for 1x1s.
@@ -116,6 +156,7 @@ class RectangularGridShadingSolver():
                     require(connectivity_grid[r][c] | var_in(self.grid[r][c], self.__shading_symbols))
             require(sum_bools(1, [chosen[r][c] for c in range(self.cols) for r in range(self.rows)]))
         
+    @profiled
     def black_clues(self, clue_cells):
         '''
         Require that clue cells are shaded.
@@ -123,11 +164,12 @@ class RectangularGridShadingSolver():
         for (r, c) in clue_cells:
             require(var_in(self.grid[r][c], self.__shading_symbols))
 
+    @profiled
     def black_connectivity(self, known_root = None):
         '''
         Require that black cells are connected.
         '''
-        connectivity_grid = RectangularGrid(self.rows, self.cols, Atom)
+        connectivity_grid = RectangularGrid.of_atoms(self.rows, self.cols)
         if known_root:
             connectivity_grid[known_root[0]][known_root[1]].prove_if(True)
             for r in range(self.rows):
@@ -138,7 +180,7 @@ class RectangularGridShadingSolver():
                                 connectivity_grid[y][x])
                     require(connectivity_grid[r][c] | ~var_in(self.grid[r][c], self.__shading_symbols))
         else:
-            chosen = RectangularGrid(self.rows, self.cols, BoolVar)
+            chosen = RectangularGrid.of_bools(self.rows, self.cols)
             for r in range(self.rows):
                 for c in range(self.cols):
                     for (y, x) in connectivity_grid.get_neighbors(r, c):
@@ -148,11 +190,12 @@ class RectangularGridShadingSolver():
                     require(connectivity_grid[r][c] | ~var_in(self.grid[r][c], self.__shading_symbols))
             require(sum_bools(1, [chosen[r][c] for c in range(self.cols) for r in range(self.rows)]))
         
+    @profiled
     def black_edge_connectivity(self):
         '''
         Require that every black cell is connected to an edge.
         '''
-        connectivity_grid = RectangularGrid(self.rows, self.cols, Atom)
+        connectivity_grid = RectangularGrid.of_atoms(self.rows, self.cols)
         for r in range(self.rows):
             for c in range(self.cols):
                 if r == 0 or r == self.rows-1 or c == 0 or c == self.cols-1:
@@ -171,4 +214,5 @@ class RectangularGridShadingSolver():
         return get_all_grid_solutions(self.grid,
             equality_function = lambda x, y: var_in(x, self.__shading_symbols) == var_in(y, self.__shading_symbols),
             format_function = lambda r, c: shaded_color if self.grid[r][c].value() in self.__shading_symbols else '',
-            debug_function = debug_function)
+            debug_function = debug_function,
+            projection = [[var_in(x, self.__shading_symbols) for x in row] for row in self.grid])
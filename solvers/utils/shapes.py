@@ -1,3 +1,5 @@
+import functools
+
 from .grids import *
 
 OMINOES = {
@@ -144,6 +146,33 @@ def place_shape_in_grid(rows, cols, shape, anchor_r, anchor_c):
             return None
     return tuple(absolute_coords)
 
+@functools.lru_cache(maxsize = TABLE_CACHE_SIZE)
+def get_placement_table(rows, cols, shapes):
+    '''
+    Given the dimensions of a puzzle (rows, cols) and
+    a frozenset of canonical shapes (e.g. the variants of a shape),
+
+    Return (placements, covering), where
+     - placements is a tuple of every way to place one of the shapes in the grid
+     (each a tuple of the coordinates of its cells, as from place_shape_in_grid)
+     - covering[r*cols + c] is a tuple of the indices (in placements)
+     of the placements that cover (r, c)
+
+    The table is built once per (rows, cols, shapes) and cached,
+    so don't modify it.
+    '''
+    placements = []
+    covering = [[] for i in range(rows*cols)]
+    for shape in sorted(shapes):
+        for r in range(rows):
+            for c in range(cols):
+                occupied_cells = place_shape_in_grid(rows, cols, shape, r, c)
+                if occupied_cells is not None:
+                    for y, x in occupied_cells:
+                        covering[y*cols + x].append(len(placements))
+                    placements.append(occupied_cells)
+    return tuple(placements), tuple(tuple(indices) for indices in covering)
+
 def place_shape_in_region(region, shape, anchor_r, anchor_c):
     '''
     Given the a list of (r, c) coordinates that make up a region,
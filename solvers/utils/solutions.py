@@ -1,27 +1,347 @@
 from ..claspy import *
-from datetime import datetime
+from .. import claspy
+from . import profiling
+from .grids import RectangularGrid
+import math
+import subprocess
+import threading
+import time
+
+try:
+    import clingo
+except ImportError:
+    clingo = None
 
 MAX_SOLUTIONS_TO_FIND = 10
 
+# solve modes
+ALL_SOLUTIONS = 'all' # find up to MAX_SOLUTIONS_TO_FIND solutions
+UNIQUENESS_CHECK = 'unique' # stop at the second solution (is there 0, 1, or more than 1?)
+SOLVE_MODES = (ALL_SOLUTIONS, UNIQUENESS_CHECK)
+
+# The options of the solve that's currently running; these are set (with set_solve_options)
+# by whoever calls a puzzle type's solve function, so the solve functions don't have to pass them along.
+solve_mode = ALL_SOLUTIONS
+max_solutions = MAX_SOLUTIONS_TO_FIND # max # solutions to find in ALL_SOLUTIONS mode
+deadline = None # the time.time() to give up at, or None
+cancel_event = None # an Event that's set to give up early, or None
+
+# Set by get_all_solutions if it gave up (see stop_requested) before finding every solution.
+truncated = False
+
+# Measurements of the last solve, taken by get_all_solutions (see test/benchmark.py):
+#  - num_vars, num_rules: the size of the claspy problem when clasp is first run
+#  - clasp_seconds: the time spent running clasp
+#  - generate_seconds: the time spent in generate_solution
+solve_stats = {}
+
+def set_solve_options(mode = ALL_SOLUTIONS, max_solutions_to_find = MAX_SOLUTIONS_TO_FIND,
+        solve_deadline = None, solve_cancel_event = None):
+    '''
+    Sets the options of the next solve (and resets `truncated` and `solve_stats`).
+    '''
+    global solve_mode, max_solutions, deadline, cancel_event, truncated, solve_stats
+    solve_mode = mode
+    max_solutions = max_solutions_to_find
+    deadline = solve_deadline
+    cancel_event = solve_cancel_event
+    truncated = False
+    solve_stats = {}
+
+def stop_requested():
+    '''
+    Returns True if the current solve has run past its deadline or been cancelled.
+    '''
+    return (deadline is not None and time.time() >= deadline) or \
+        (cancel_event is not None and cancel_event.is_set())
+
+# If True, solutions are enumerated by a single clasp run (see claspy_solve_all)
+# whenever the caller says which variables tell solutions apart;
+# otherwise clasp is re-run once per solution, with a blocking constraint in between.
+NATIVE_ENUMERATION = True
+
+# How clasp is run:
+#  - IN_PROCESS: inside this process, through the clingo Python module (if it's installed),
+#  so a solve doesn't have to start a clasp process, and load it, for every call
+#  - SUBPROCESS: as a new process (claspy.CLASP_COMMAND) for every call
+IN_PROCESS = 'in_process'
+SUBPROCESS = 'subprocess'
+SOLVER_BACKEND = IN_PROCESS if clingo is not None else SUBPROCESS
+
+# If not None, this is called with each solution as soon as it is found
+# (used to report the progress of asynchronous solves).
+solution_listener = None
+
 def rc_to_grid(r, c):
     return f'{2*r+1},{2*c+1}'
 
 def default_equality_function(x, y):
     return x == y
     
-def get_all_solutions(generate_solution, avoid_duplicate_solution, debug_function = None):
+def get_atoms(variables):
+    '''
+    Given a (nested) list or RectangularGrid of claspy variables
+    (BoolVars, Atoms, IntVars or MultiVars),
+    returns the set of clasp atoms that their values depend on,
+    or None if one of them isn't a claspy variable.
+    '''
+    if isinstance(variables, RectangularGrid):
+        return get_atoms(variables.cells)
+    elif isinstance(variables, (list, tuple)):
+        atoms = set()
+        for variable in variables:
+            variable_atoms = get_atoms(variable)
+            if variable_atoms is None:
+                return None
+            atoms |= variable_atoms
+        return atoms
+    elif isinstance(variables, (BoolVar, Atom)):
+        return {abs(variables.index)}
+    elif isinstance(variables, IntVar):
+        return get_atoms(variables.bits)
+    elif isinstance(variables, MultiVar):
+        return get_atoms(list(variables.vals.values()))
+    return None
+
+def parse_smodels_rule(rule):
+    '''
+    Parses a rule in claspy's clasp_rules (in the SMODELS internal format; see the
+    lparse documentation). Returns (choice, head atoms, bound, body), where body is a
+    list of (literal, weight) pairs, and the rule's body holds if the sum of the
+    weights of its true literals is at least bound (None for a plain conjunction).
+    '''
+    if isinstance(rule, str):
+        rule = list(map(int, rule.split()))
+    rule_type = rule[0]
+    if rule_type == 1: # basic: 1 head #literals #negative [negative] [positive]
+        head, (n, n_neg), rest = [rule[1]], rule[2:4], rule[4:]
+        bound, weights = None, [1] * n
+    elif rule_type == 2: # constraint: 2 head #literals #negative bound [negative] [positive]
+        head, (n, n_neg, bound), rest = [rule[1]], rule[2:5], rule[5:]
+        weights = [1] * n
+    elif rule_type == 3: # choice: 3 #heads [heads] #literals #negative [negative] [positive]
+        n_heads = rule[1]
+        head, (n, n_neg), rest = rule[2:2+n_heads], rule[2+n_heads:4+n_heads], rule[4+n_heads:]
+        bound, weights = None, [1] * n
+    elif rule_type == 5: # weight: 5 head bound #literals #negative [negative] [positive] [weights]
+        head, (bound, n, n_neg), rest = [rule[1]], rule[2:5], rule[5:]
+        weights = rest[n:2*n]
+    else:
+        raise ValueError(f'Unsupported rule type: {rule_type}')
+    body = [(-a if i < n_neg else a, weight) for i, (a, weight) in enumerate(zip(rest[:n], weights))]
+    return rule_type == 3, head, bound, body
+
+def smodels_to_aspif(rule):
+    '''
+    Converts a rule in claspy's clasp_rules (see parse_smodels_rule)
+    to a line of the ASP intermediate format (aspif) that clasp reads.
+    '''
+    choice, head, bound, body = parse_smodels_rule(rule)
+    if bound is None:
+        aspif_body = [0, len(body)] + [literal for literal, weight in body]
+    else:
+        aspif_body = [1, bound, len(body)]
+        for literal, weight in body:
+            aspif_body += [literal, weight]
+    return ' '.join(map(str, [1, int(choice), len(head)] + head + aspif_body))
+
+def claspy_solve_all(projection, max_models, on_model):
+    '''
+    Enumerates up to max_models solutions of the current claspy problem with a
+    single clasp run, counting two solutions as the same if they agree on
+    every atom in `projection` (see get_atoms).
+
+    For every solution found, this sets claspy's solution (so that .value() works)
+    and calls on_model(). Returns False if clasp couldn't be run this way.
+
+    clasp is killed as soon as stop_requested() is True.
+    '''
+    if SOLVER_BACKEND == IN_PROCESS:
+        return clingo_solve(projection, max_models, on_model) is not None
+
+    with profiling.phase('ground'):
+        program = ['asp 1 0 0']
+        try:
+            program += [smodels_to_aspif(rule) for rule in claspy.clasp_rules]
+        except (ValueError, IndexError):
+            return False
+        program.append('1 0 0 0 1 1') # atom 1 is claspy's "false"
+        program.append('3 ' + ' '.join(map(str, [len(projection)] + sorted(projection))))
+        program += [f'4 {len(str(i))+1} v{i} 1 {i}' for i in range(2, claspy.last_bool+1)]
+        program.append('0\n')
+
+    command = claspy.CLASP_COMMAND.split() + [f'--models={max_models}', '--project']
+    clasp_process = subprocess.Popen(command, stdin = subprocess.PIPE,
+        stdout = subprocess.PIPE, stderr = subprocess.DEVNULL, text = True)
+
+    # kill clasp if the solve runs out of time or is cancelled
+    finished = threading.Event()
+    def watch():
+        while not finished.wait(0.05):
+            if stop_requested():
+                clasp_process.kill()
+                return
+    if deadline is not None or cancel_event is not None:
+        threading.Thread(target = watch, daemon = True).start()
+
+    try:
+        clasp_process.stdin.write('\n'.join(program))
+        clasp_process.stdin.close()
+    except (BrokenPipeError, OSError):
+        # clasp stops reading early if the problem is obviously unsatisfiable
+        pass
+
+    found = False
+    reading_model = False
+    for line in clasp_process.stdout:
+        if reading_model:
+            claspy.solution = set(int(atom[1:]) for atom in line.split())
+            on_model()
+            reading_model = False
+        elif line.startswith('Answer:'):
+            found = reading_model = True
+    finished.set()
+    # clasp's exit code is a bitmask of 10 (found a model), 20 (search space exhausted),
+    # plus 1 if interrupted; 65 and up are errors
+    return clasp_process.wait() < 65 or found
+
+def clingo_solve(projection, max_models, on_model):
+    '''
+    Like claspy_solve_all, but runs clasp inside this process (with the clingo module),
+    with an empty projection to not project at all.
+    Returns the # solutions found, or None if the problem couldn't be given to clasp.
+
+    The solve is interrupted as soon as stop_requested() is True.
+    '''
+    with profiling.phase('ground'):
+        try:
+            rules = [parse_smodels_rule(rule) for rule in claspy.clasp_rules]
+        except (ValueError, IndexError):
+            return None
+        arguments = [f'--models={max_models}']
+        if projection:
+            arguments.append('--project')
+        control = clingo.Control(arguments)
+        with control.backend() as backend:
+            # clingo's program atom for each of claspy's atoms (claspy's are numbered from 1)
+            atoms = [0] + [backend.add_atom() for i in range(claspy.last_bool)]
+            def get_literal(literal):
+                return atoms[literal] if literal > 0 else -atoms[-literal]
+            try:
+                for choice, head, bound, body in rules:
+                    head = [atoms[a] for a in head]
+                    if bound is None:
+                        backend.add_rule(head, [get_literal(literal) for literal, weight in body], choice)
+                    else:
+                        backend.add_weight_rule(head, bound,
+                            [(get_literal(literal), weight) for literal, weight in body], choice)
+            except IndexError:
+                return None
+            backend.add_rule([], [atoms[1]]) # atom 1 is claspy's "false"
+            if projection:
+                backend.add_project([atoms[a] for a in sorted(projection)])
+
+    num_models = 0
+    def on_clingo_model(model):
+        nonlocal num_models
+        num_models += 1
+        claspy.solution = set(i for i in range(2, len(atoms)) if model.is_true(atoms[i]))
+        on_model()
+
+    # only poll for a stop if there can be one
+    poll_seconds = 0.05 if deadline is not None or cancel_event is not None else None
+    with control.solve(on_model = on_clingo_model, async_ = True) as handle:
+        while not handle.wait(poll_seconds):
+            if stop_requested():
+                handle.cancel()
+        handle.get()
+    return num_models
+
+def claspy_solve_until_stopped():
+    '''
+    Like claspy_solve, but with clasp's time limit set to the solve's deadline.
+    (Cancellation is only noticed between calls, unless clasp runs in this process.)
+    '''
+    if SOLVER_BACKEND == IN_PROCESS:
+        num_models = clingo_solve(set(), 1, lambda: None)
+        if num_models is not None:
+            return num_models > 0
+    if deadline is None:
+        return claspy_solve()
+    clasp_command = claspy.CLASP_COMMAND
+    claspy.CLASP_COMMAND += f' --time-limit={max(1, math.ceil(deadline - time.time()))}'
+    try:
+        return claspy_solve()
+    finally:
+        claspy.CLASP_COMMAND = clasp_command
+
+def get_all_solutions(generate_solution, avoid_duplicate_solution, debug_function = None, projection = None):
+    '''
+    Returns a list of (up to max_solutions, or 2 for a uniqueness check)
+    solutions, as generated by generate_solution.
+
+    If given, projection is a (nested) list of the claspy variables that tell
+    solutions apart; all solutions are then found by a single clasp run.
+    Otherwise, after each solution, avoid_duplicate_solution is called to
+    rule it out, and clasp is run again.
+
+    If the solve runs past its deadline or is cancelled, this returns
+    the solutions found so far and sets `truncated`.
+    '''
+    global truncated
     solutions = []
-    #print(f'starting search - it\'s {datetime.now()}', flush=True)
-    for i in range(MAX_SOLUTIONS_TO_FIND):
-        if claspy_solve():
-    #        print(f'solution {i+1} found at {datetime.now()}', flush=True)
+    stats = solve_stats
+    stats.setdefault('num_vars', claspy.last_bool)
+    stats.setdefault('num_rules', len(claspy.clasp_rules))
+    stats.setdefault('clasp_seconds', 0.0)
+    stats.setdefault('generate_seconds', 0.0)
+
+    def add_solution():
+        start = time.perf_counter()
+        with profiling.phase('generate_solution'):
             solutions.append(generate_solution())
+        stats['generate_seconds'] += time.perf_counter() - start
+        if solution_listener:
+            solution_listener(solutions[-1])
+
+    def on_model():
+        add_solution()
+        if debug_function:
+            debug_function()
+
+    solutions_to_find = 2 if solve_mode == UNIQUENESS_CHECK else max_solutions
+    atoms = get_atoms(projection) if projection is not None else None
+    if stop_requested():
+        truncated = True
+        return solutions
+    start, generate_seconds = time.perf_counter(), stats['generate_seconds']
+    enumerated = False
+    if NATIVE_ENUMERATION and atoms:
+        with profiling.phase('clasp'):
+            enumerated = claspy_solve_all(atoms, solutions_to_find, on_model)
+    if enumerated:
+        # (generate_solution runs while clasp is still printing models)
+        stats['clasp_seconds'] += time.perf_counter() - start - (stats['generate_seconds'] - generate_seconds)
+        truncated = truncated or stop_requested()
+        return solutions
+
+    for i in range(solutions_to_find):
+        if stop_requested():
+            truncated = True
+            break
+        start = time.perf_counter()
+        with profiling.phase('clasp'):
+            found = claspy_solve_until_stopped()
+        stats['clasp_seconds'] += time.perf_counter() - start
+        if found:
+            add_solution()
             avoid_duplicate_solution()
             if debug_function:
                 debug_function()
         else:
+            # clasp also stops without a solution when it hits its time limit
+            truncated = truncated or stop_requested()
             break
-    #print(f'all solutions found - it\'s {datetime.now()}', flush=True)
     return solutions
 
 def get_grid_solution(grid, format_function = None):
@@ -47,7 +367,15 @@ def avoid_duplicate_grid_solution(grid, equality_function = default_equality_fun
 def get_all_grid_solutions(grid,
         equality_function = default_equality_function,
         format_function = None,
-        debug_function = None):
+        debug_function = None,
+        projection = None):
+    '''
+    Returns a list of solutions of a grid (see get_grid_solution).
+
+    Two solutions are the same if equality_function holds on every cell; for a
+    custom equality_function, pass the variables that it compares as projection
+    (see get_all_solutions) to find every solution with a single clasp run.
+    '''
         
     def generate_solution():
         return get_grid_solution(grid, format_function)
@@ -55,5 +383,7 @@ def get_all_grid_solutions(grid,
     def avoid_duplicate_solution():
         return avoid_duplicate_grid_solution(grid, equality_function)
 
-    return get_all_solutions(generate_solution, avoid_duplicate_solution, debug_function)
+    if projection is None and equality_function == default_equality_function:
+        projection = grid
 
+    return get_all_solutions(generate_solution, avoid_duplicate_solution, debug_function, projection)
@@ -0,0 +1,207 @@
+from .borders import *
+from .encoding import *
+from .loops import *
+
+# The 8 symmetries of a rectangle (the dihedral group), acting on
+# "doubled" coordinates: cell (r, c) is at (2r+1, 2c+1), borders are at
+# the coordinates in between (see borders.py), and outside clues are at
+# row / column -1 and 2*rows+1 / 2*cols+1. All of these can be transformed
+# the same way, so that's what we work with.
+#
+#  - ROT90 is a clockwise rotation
+#  - FLIP_H mirrors left <-> right, FLIP_V mirrors top <-> bottom
+#  - TRANSPOSE mirrors along the main diagonal, ANTITRANSPOSE along the other one
+IDENTITY = 'identity'
+ROT90 = 'rot90'
+ROT180 = 'rot180'
+ROT270 = 'rot270'
+FLIP_H = 'flip_h'
+FLIP_V = 'flip_v'
+TRANSPOSE = 'transpose'
+ANTITRANSPOSE = 'antitranspose'
+
+ALL_SYMMETRIES = (IDENTITY, ROT90, ROT180, ROT270, FLIP_H, FLIP_V, TRANSPOSE, ANTITRANSPOSE)
+
+# the symmetries which swap the number of rows and the number of columns
+DIMENSION_SWAPPING = (ROT90, ROT270, TRANSPOSE, ANTITRANSPOSE)
+
+INVERSE_SYMMETRY = {symmetry: symmetry for symmetry in ALL_SYMMETRIES}
+INVERSE_SYMMETRY[ROT90], INVERSE_SYMMETRY[ROT270] = ROT270, ROT90
+
+def transform_point(symmetry, height, width, i, j):
+    '''
+    Given a symmetry, the doubled dimensions (2*rows, 2*cols) of a grid,
+    and a doubled coordinate (i, j) in that grid,
+
+    Returns the doubled coordinate of the point it's mapped to.
+
+    (With height = width = 0, this also transforms offsets like (-1, 0).)
+    '''
+    if symmetry == IDENTITY:
+        return i, j
+    elif symmetry == ROT90:
+        return j, height-i
+    elif symmetry == ROT180:
+        return height-i, width-j
+    elif symmetry == ROT270:
+        return width-j, i
+    elif symmetry == FLIP_H:
+        return i, width-j
+    elif symmetry == FLIP_V:
+        return height-i, j
+    elif symmetry == TRANSPOSE:
+        return j, i
+    elif symmetry == ANTITRANSPOSE:
+        return width-j, height-i
+    else:
+        raise ValueError(f'Unknown symmetry: {symmetry}')
+
+def transform_dimensions(symmetry, rows, cols):
+    '''
+    Returns the (rows, cols) of a grid after the symmetry is applied.
+    '''
+    return (cols, rows) if symmetry in DIMENSION_SWAPPING else (rows, cols)
+
+# --- CLUE AND SOLUTION VALUE REMAPPINGS ---
+
+ARROW_OFFSETS = {'u': (-1, 0), 'd': (1, 0), 'l': (0, -1), 'r': (0, 1)}
+OFFSET_ARROWS = {offset: arrow for arrow, offset in ARROW_OFFSETS.items()}
+
+def transform_arrow(symmetry, arrow):
+    '''
+    Returns the direction ('u', 'd', 'l' or 'r') that an arrow points in
+    after the symmetry is applied.
+    '''
+    return OFFSET_ARROWS[transform_point(symmetry, 0, 0, *ARROW_OFFSETS[arrow])]
+
+def remap_arrows(value, symmetry):
+    '''
+    Transforms every direction letter ('u', 'd', 'l', 'r') in a clue value,
+    which may be a (nested) list, e.g. ['2', 'l'] or [['0', 'u'], 'gray'].
+    '''
+    if isinstance(value, (list, tuple)):
+        return type(value)(remap_arrows(x, symmetry) for x in value)
+    elif isinstance(value, str) and value in ARROW_OFFSETS:
+        return transform_arrow(symmetry, value)
+    return value
+
+# the sides of a cell that each loop pattern connects to (see loops.py)
+LOOP_PATTERN_ARROWS = {
+    'J': 'lu', '7': 'ld', 'L': 'ru', 'r': 'rd', '-': 'lr', '1': 'ud',
+}
+ARROWS_LOOP_PATTERN = {frozenset(arrows): pattern for pattern, arrows in LOOP_PATTERN_ARROWS.items()}
+# the direction that each arrow character (the last character of a directed pattern) points in
+POINTER_ARROWS = {'^': 'u', 'v': 'd', '<': 'l', '>': 'r'}
+ARROWS_POINTER = {arrow: pointer for pointer, arrow in POINTER_ARROWS.items()}
+UNICODE_TO_DIRECTIONAL_PAIR = {unicode: pair for pair, unicode in DIRECTIONAL_PAIR_TO_UNICODE.items()}
+
+def transform_loop_pattern(symmetry, pattern):
+    '''
+    Transforms a loop pattern, either undirected (e.g. 'J')
+    or directed (e.g. 'J^', which comes in from the left and goes out the top).
+    '''
+    arrows = {transform_arrow(symmetry, arrow) for arrow in LOOP_PATTERN_ARROWS[pattern[0]]}
+    if len(pattern) == 1:
+        return ARROWS_LOOP_PATTERN[frozenset(arrows)]
+    pointer = ARROWS_POINTER[transform_arrow(symmetry, POINTER_ARROWS[pattern[1]])]
+    return ARROWS_LOOP_PATTERN[frozenset(arrows)] + pointer
+
+def remap_loop_image(value, symmetry):
+    '''
+    Transforms a loop solution value, e.g. 'J.png', or '⬏.png' for directed loops.
+    Any other value (e.g. 'black') is left alone.
+    '''
+    if not isinstance(value, str) or not value.endswith('.png'):
+        return value
+    name = value[:-len('.png')]
+    if name in LOOP_PATTERN_ARROWS:
+        return transform_loop_pattern(symmetry, name) + '.png'
+    elif name in UNICODE_TO_DIRECTIONAL_PAIR:
+        pattern = transform_loop_pattern(symmetry, UNICODE_TO_DIRECTIONAL_PAIR[name])
+        return DIRECTIONAL_PAIR_TO_UNICODE[pattern] + '.png'
+    return value
+
+def keep_value(value, symmetry):
+    return value
+
+class GenreSymmetry:
+    '''
+    Declares which symmetries a puzzle genre is invariant under,
+    i.e. for which symmetries transforming a puzzle's clues and then solving
+    gives the same solutions as solving and then transforming the solutions.
+
+    A solver module declares this as a module-level SYMMETRY attribute;
+    genres without one are never transformed.
+    '''
+    def __init__(self, symmetries = ALL_SYMMETRIES, clue_map = keep_value, solution_map = keep_value):
+        '''
+        symmetries = the symmetries that the genre is invariant under
+        clue_map = a function (clue value, symmetry) -> transformed clue value,
+        for clues that have an orientation (e.g. arrows)
+        solution_map = a function (solution value, symmetry) -> transformed solution value,
+        for solution values that have an orientation (e.g. loop segments)
+        '''
+        self.symmetries = tuple(symmetries)
+        self.clue_map = clue_map
+        self.solution_map = solution_map
+
+    def transform_encoding(self, E, symmetry):
+        '''
+        Returns the Encoding of the puzzle E after the symmetry is applied.
+        '''
+        height, width = 2*E.R, 2*E.C
+        rows, cols = transform_dimensions(symmetry, E.R, E.C)
+
+        clue_cells = {}
+        for (r, c), value in E.clues.items():
+            i, j = transform_point(symmetry, height, width, 2*r+1, 2*c+1)
+            clue_cells[(i//2, j//2)] = self.clue_map(value, symmetry)
+
+        edge_ids = None
+        if E.edges is not None:
+            edge_ids = set()
+            for edge_id in E.edges:
+                i, j = map(int, get_border_coord_from_edge_id(*edge_id).split(','))
+                edge_ids.add(get_edge_id_from_border_coord(rows, cols,
+                    *transform_point(symmetry, height, width, i, j)))
+
+        # outside clues move to whichever side their side gets mapped to
+        outside = {'top': {}, 'right': {}, 'bottom': {}, 'left': {}}
+        present = set()
+        for side, clues, coord in (('top', E.top, lambda k: (-1, 2*k+1)),
+                                   ('right', E.right, lambda k: (2*k+1, width+1)),
+                                   ('bottom', E.bottom, lambda k: (height+1, 2*k+1)),
+                                   ('left', E.left, lambda k: (2*k+1, -1))):
+            if clues is None:
+                continue
+            i, j = transform_point(symmetry, height, width, *coord(0))
+            if i == -1:
+                new_side, index = 'top', lambda i, j: j//2
+            elif i == 2*rows+1:
+                new_side, index = 'bottom', lambda i, j: j//2
+            elif j == -1:
+                new_side, index = 'left', lambda i, j: i//2
+            else:
+                new_side, index = 'right', lambda i, j: i//2
+            present.add(new_side)
+            for k, value in clues.items():
+                i, j = transform_point(symmetry, height, width, *coord(k))
+                outside[new_side][index(i, j)] = self.clue_map(value, symmetry)
+        for side in outside:
+            if side not in present:
+                outside[side] = None
+
+        return Encoding(rows, cols, clue_cells, E.params, edge_ids,
+            outside['top'], outside['right'], outside['bottom'], outside['left'])
+
+    def transform_solution(self, solution, rows, cols, symmetry):
+        '''
+        Given a solution (a dictionary mapping doubled coordinate strings, e.g. '1,3',
+        to values) of a rows x cols puzzle, returns the solution after the symmetry is applied.
+        '''
+        transformed = {}
+        for coord, value in solution.items():
+            i, j = map(int, coord.split(','))
+            i, j = transform_point(symmetry, 2*rows, 2*cols, i, j)
+            transformed[f'{i},{j}'] = self.solution_map(value, symmetry)
+        return transformed
@@ -1,6 +1,9 @@
 from .claspy import *
 from . import utils
 
+SYMMETRY = utils.symmetry.GenreSymmetry(clue_map = utils.symmetry.remap_arrows,
+    solution_map = utils.symmetry.remap_loop_image)
+
 def encode(string):
     return utils.encode(string, clue_encoder = lambda s : s)
 
@@ -2,6 +2,8 @@ from .claspy import *
 from . import utils
 from .utils.encoding import *
 
+SYMMETRY = utils.symmetry.GenreSymmetry(clue_map = utils.symmetry.remap_arrows)
+
 def encode(string):
     return utils.encode(string, clue_encoder = lambda s : s)
 
@@ -56,15 +58,14 @@ def solve(E):
             sum_bools(int(num_string), [grid[x][y] for (x,y) in seen_cells]) | grid[r][c]
         )
 
-    sols = []
-    while len(sols) < MAX_SOLUTIONS_TO_FIND and claspy_solve():
-        # append found solution
+    def generate_solution():
         sol = {}
         for r in range(E.R):
             for c in range(E.C):
                 sol[rc_to_grid(r,c)] = 'darkgray' if grid[r][c].value() else ''
-        sols.append(sol)
+        return sol
 
+    def avoid_duplicate_solution():
         # prevent duplicate solution before re-solving
         x = BoolVar(True)
         for r in range(E.R):
@@ -72,7 +73,7 @@ def solve(E):
                 x &= (grid[r][c] == grid[r][c].value())
         require(~x)
 
-    return sols
+    return get_all_solutions(generate_solution, avoid_duplicate_solution)
     
 def decode(solutions):
     return utils.decode(solutions)
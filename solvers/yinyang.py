@@ -2,6 +2,8 @@ from .claspy import *
 from . import utils
 from .utils.solutions import *
 
+SYMMETRY = utils.symmetry.GenreSymmetry()
+
 def encode(string):
     return utils.encode(string, clue_encoder = lambda s: s)
     
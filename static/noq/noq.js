@@ -118,6 +118,8 @@ const COL_LIMIT = 30;
 
 let active_element = null;
 let current_request = null;
+let current_job_id = null; // the solver job being waited on, if any
+let current_stream = null; // the EventSource streaming its solutions, if any
 let status = 'unsolved';
 
 let ROWS = null;
@@ -412,6 +414,19 @@ function set_unsolved()
 		current_request.stopped = true;
 		current_request = null;
 	}
+	if (current_stream)
+	{
+		current_stream.close();
+		current_stream = null;
+	}
+	if (current_job_id)
+	{
+		// stop the solver too, rather than just ignoring its result
+		let cancel_request = new XMLHttpRequest();
+		cancel_request.open("DELETE", `solver/jobs/${current_job_id}`);
+		cancel_request.send();
+		current_job_id = null;
+	}
 	spinner_pos = null;
 	let solution_num, solutions, num_solutions;
 
@@ -633,11 +648,24 @@ function parse_input()
     return JSON.stringify(puzzle);
 }
 
+const JOB_POLL_INTERVAL = 500; // ms between checks on a running solve
+
+// solver_mode (set by the page) says how to solve:
+// 'solve' waits on a single request, 'poll' and 'stream' run a job (see noq/settings.py)
 function solve_puzzle()
 {
 	still_going = true;
+	if (solver_mode == 'poll' || solver_mode == 'stream')
+		submit_job();
+	else
+		request_solutions();
+    spinner(start=true);
+}
+
+function request_solutions()
+{
 	current_request = new XMLHttpRequest();
-	current_request.open("GET",`solver?puzzle_type=${pt}&puzzle=${encodeURI(parse_input())}`);
+	current_request.open("GET", `solver?puzzle_type=${encodeURIComponent(pt)}&puzzle=${encodeURIComponent(parse_input())}`);
 	current_request.onreadystatechange = function()
 	{
 		if (this.stopped)
@@ -649,12 +677,126 @@ function solve_puzzle()
 		  		set_solved();
 		  		display_solutions(this.responseText);
 		  	}
-	       	else if (this.status != 200 && this.status != 0) // something went wrong
+	       	else if (this.status != 0) // something went wrong
 	    		display_error_message(this.responseText);
 	    }
 	}
 	current_request.send();
-    spinner(start=true);
+}
+
+function submit_job()
+{
+	current_request = new XMLHttpRequest();
+	current_request.open("POST", "solver/jobs");
+	current_request.setRequestHeader("Content-Type", "application/x-www-form-urlencoded");
+	current_request.onreadystatechange = function()
+	{
+		if (this.stopped)
+			return;
+	  	else if (this.readyState == 4)
+	  	{
+	  		if (this.status == 202) // job was queued; wait for it to finish
+	  		{
+	  			current_job_id = JSON.parse(this.responseText).id;
+	  			if (solver_mode == 'stream' && window.EventSource)
+	  				stream_job(current_job_id);
+	  			else
+	  				poll_job(current_job_id);
+	  		}
+	       	else if (this.status != 0) // something went wrong
+	    		display_error_message(this.responseText);
+	    }
+	}
+	current_request.send(`puzzle_type=${encodeURIComponent(pt)}&puzzle=${encodeURIComponent(parse_input())}`);
+}
+
+function poll_job(job_id)
+{
+	current_request = new XMLHttpRequest();
+	current_request.open("GET", `solver/jobs/${job_id}`);
+	current_request.onreadystatechange = function()
+	{
+		if (this.stopped)
+			return;
+	  	else if (this.readyState == 4)
+	  	{
+	  		if (this.status == 200)
+		  	{
+		  		let job = JSON.parse(this.responseText);
+		  		if (job.state == 'done')
+		  		{
+		  			current_job_id = null;
+			  		set_solved();
+			  		display_solutions(JSON.stringify(job.solutions));
+		  		}
+		  		else if (job.state == 'failed')
+		  		{
+		  			current_job_id = null;
+		  			display_error_message(this.responseText);
+		  		}
+		  		else
+		  		{
+		  			let request = this;
+		  			setTimeout(function() { if (!request.stopped) poll_job(job_id); }, JOB_POLL_INTERVAL);
+		  		}
+		  	}
+	       	else if (this.status != 0) // something went wrong
+	    		display_error_message(this.responseText);
+	    }
+	}
+	current_request.send();
+}
+
+// shows each solution as soon as it's found
+function stream_job(job_id)
+{
+	let found = {num_solutions: 0};
+	current_stream = new EventSource(`solver/jobs/${job_id}/events`);
+	current_stream.addEventListener('solution', function(event)
+	{
+		found.num_solutions += 1;
+		found[found.num_solutions] = JSON.parse(event.data);
+		if (found.num_solutions == 1)
+		{
+			set_solved();
+			display_solutions(JSON.stringify(found));
+		}
+		else
+			add_solution(found);
+	});
+	current_stream.addEventListener('num_solutions', function(event)
+	{
+		this.close();
+		current_stream = null;
+		current_job_id = null;
+		let result = JSON.parse(event.data);
+		if (result.num_solutions == 0)
+		{
+			set_solved();
+			display_solutions(event.data);
+		}
+		else
+			add_solution(Object.assign(found, result));
+	});
+	current_stream.addEventListener('timeout', function(event)
+	{
+		// the server stopped streaming before the job was done; check on it instead
+		this.close();
+		current_stream = null;
+		poll_job(job_id);
+	});
+	current_stream.addEventListener('error', function(event)
+	{
+		this.close();
+		current_stream = null;
+		if (event.data) // an error from the solver, rather than from the connection
+		{
+			current_job_id = null;
+			display_error_message(event.data);
+		}
+		else // fall back to checking on the job every so often
+			poll_job(job_id);
+	});
 }
 
 let spinner_pos = null;
@@ -702,6 +844,18 @@ function display_solutions(solution_str)
 	display_next_solution();
 }
 
+// updates the solutions being shown (without changing which one is shown)
+function add_solution(all_solutions)
+{
+	solutions = all_solutions;
+	num_solutions = parseInt(solutions.num_solutions);
+	let ge = num_solutions == 10 ? "&ge;" : "";
+	let cycle_solution_html = `Solution <span id='solution_num'>${solution_num}</span> of ${ge + num_solutions}`;
+	if (num_solutions > 1)
+		cycle_solution_html += ` <button onclick='display_next_solution()'>Next solution</button>`;
+	get('header_div').innerHTML = cycle_solution_html;
+}
+
 function display_next_solution()
 {
 	solution_num = (solution_num % num_solutions) + 1; // solutions are 1-indexed so this works correctly
@@ -0,0 +1,341 @@
+'''
+Benchmarks the solvers on the test cases in test.py (and, optionally,
+larger "stress" versions of them), and writes the results as JSON so that
+two revisions can be compared.
+
+For each puzzle, this records the time spent in each phase of a solve:
+ - encode: the puzzle type's encode
+ - build: building the claspy constraints (its solve, minus the two below)
+ - solve: running clasp
+ - decode: turning clasp's models into solutions, and the puzzle type's decode
+as well as the size of the problem given to clasp (# variables and # rules),
+so that changes to how a puzzle type is encoded show up too. The size is
+also broken down by the constraint builder (the utils solver methods, see
+solvers/utils/profiling.py) that created each variable and rule, and
+--compare flags every builder whose share grew.
+
+With --regions, it also times utils.regions.full_bfs on large random
+region layouts, and with --haisu, it solves random Haisu puzzles of up to
+14x14 with each of haisu.py's path order encodings.
+'''
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import solvers
+from solvers import claspy, utils
+from solvers.utils.borders import BorderPlanes, Direction
+from .test import all_test_cases
+
+# Stress instances are the test cases with their grids enlarged by this factor
+# (the clues stay where they are). Only puzzle types without outside clues can be enlarged.
+STRESS_SCALE = 2
+STRESS_TIMEOUT_SECONDS = 60
+
+PHASES = ('encode', 'build', 'solve', 'decode')
+
+def stress_case(puzzle_json, scale = STRESS_SCALE):
+    '''
+    Returns an enlarged copy of a test case, or None if it can't be enlarged.
+    '''
+    puzzle = json.loads(puzzle_json)
+    params = puzzle['param_values']
+    if puzzle['properties'].get('outside', '0000') != '0000' or 'r' not in params or 'c' not in params:
+        return None
+    params['r'], params['c'] = str(scale*int(params['r'])), str(scale*int(params['c']))
+    return json.dumps(puzzle)
+
+def get_cases(puzzle_names, stress = False):
+    '''
+    Returns a list of (case name, puzzle type, puzzle JSON, expected # solutions or None).
+    '''
+    cases = []
+    for puzzle_name in puzzle_names:
+        for i, (expected_num_solutions, puzzle_json) in enumerate(all_test_cases[puzzle_name]):
+            cases.append((f'{puzzle_name}/{i+1}', puzzle_name, puzzle_json, expected_num_solutions))
+            if stress:
+                stress_json = stress_case(puzzle_json)
+                if stress_json is not None:
+                    cases.append((f'{puzzle_name}/{i+1}/stress', puzzle_name, stress_json, None))
+    return cases
+
+def run_case(puzzle_type, puzzle_json, timeout = None):
+    '''
+    Solves a puzzle once, and returns its measurements.
+    '''
+    claspy.reset()
+    module = getattr(solvers, puzzle_type)
+    utils.solutions.set_solve_options(solve_deadline = None if timeout is None else time.time() + timeout)
+    try:
+        start = time.perf_counter()
+        puzzle_encoding = module.encode(puzzle_json)
+        encoded = time.perf_counter()
+        utils.profiling.start_profile()
+        try:
+            with utils.profiling.phase('solve'):
+                solutions = module.solve(puzzle_encoding)
+        finally:
+            profile = utils.profiling.stop_profile()
+        solved = time.perf_counter()
+        module.decode(solutions)
+        decoded = time.perf_counter()
+
+        stats = utils.solutions.solve_stats
+        clasp_seconds = stats.get('clasp_seconds', 0.0)
+        generate_seconds = stats.get('generate_seconds', 0.0)
+        return {
+            'num_solutions': len(solutions),
+            'truncated': utils.solutions.truncated,
+            'encode': encoded - start,
+            'build': solved - encoded - clasp_seconds - generate_seconds,
+            'solve': clasp_seconds,
+            'decode': decoded - solved + generate_seconds,
+            'total': decoded - start,
+            'num_vars': stats.get('num_vars', claspy.last_bool),
+            'num_rules': stats.get('num_rules', len(claspy.clasp_rules)),
+            # the variables and rules created by each constraint builder (and the genre's solve)
+            'builders': {name: {'vars': phase_stats['vars'], 'rules': phase_stats['rules']}
+                for name, phase_stats in profile.to_dict()['phases'].items()
+                if phase_stats['vars'] or phase_stats['rules']},
+        }
+    finally:
+        utils.solutions.set_solve_options()
+
+def run_benchmark(cases, repeat = 1):
+    '''
+    Runs each case `repeat` times; the fastest time of each phase is kept.
+    '''
+    results = {}
+    for case_name, puzzle_type, puzzle_json, expected_num_solutions in cases:
+        print(f'benchmarking {case_name}', flush = True)
+        try:
+            timeout = STRESS_TIMEOUT_SECONDS if expected_num_solutions is None else None
+            runs = [run_case(puzzle_type, puzzle_json, timeout) for i in range(repeat)]
+        except Exception as exc:
+            results[case_name] = {'error': str(exc)}
+            continue
+        result = runs[0]
+        for phase in PHASES + ('total',):
+            result[phase] = min(run[phase] for run in runs)
+        if expected_num_solutions is not None:
+            result['expected_num_solutions'] = expected_num_solutions
+        results[case_name] = result
+    return results
+
+def random_region_borders(rows, cols, num_regions, seed = 0):
+    '''
+    Returns the set of edge ids that divides a rows x cols grid into
+    (at most) num_regions random regions, each grown from a random seed cell.
+    '''
+    rng = random.Random(seed)
+    owner = {}
+    frontier = []
+    for i in range(num_regions):
+        cell = (rng.randrange(rows), rng.randrange(cols))
+        if cell not in owner:
+            owner[cell] = i
+            frontier.append(cell)
+    while frontier:
+        r, c = frontier.pop(rng.randrange(len(frontier)))
+        for neighbor in ((r-1, c), (r+1, c), (r, c-1), (r, c+1)):
+            if neighbor not in owner and 0 <= neighbor[0] < rows and 0 <= neighbor[1] < cols:
+                owner[neighbor] = owner[(r, c)]
+                frontier.append(neighbor)
+    borders = set()
+    for r in range(rows):
+        borders.add((r, 0, Direction.LEFT))
+        borders.add((r, cols-1, Direction.RIGHT))
+        for c in range(1, cols):
+            if owner[(r, c)] != owner[(r, c-1)]:
+                borders.add((r, c, Direction.LEFT))
+    for c in range(cols):
+        borders.add((0, c, Direction.TOP))
+        borders.add((rows-1, c, Direction.BOTTOM))
+        for r in range(1, rows):
+            if owner[(r, c)] != owner[(r-1, c)]:
+                borders.add((r, c, Direction.TOP))
+    return borders
+
+def run_region_benchmark(size = 50, num_regions = 250, repeat = 20):
+    '''
+    Times full_bfs on a size x size grid of random regions, with the borders
+    given as a set of edge ids and as a BorderPlanes (as in a PackedEncoding).
+    Returns the fastest time of each, in seconds.
+    '''
+    borders = random_region_borders(size, size, num_regions)
+    planes = BorderPlanes(size, size, borders)
+    results = {'size': size, 'num_regions': num_regions}
+    for name, given_borders in (('edge_set', borders), ('border_planes', planes)):
+        times = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            utils.regions.full_bfs(size, size, given_borders)
+            times.append(time.perf_counter() - start)
+        results[name] = min(times)
+    return results
+
+def random_hamiltonian_path(rows, cols, rng, num_moves = 20):
+    '''
+    Returns a random path through every cell of a rows x cols grid, as a list of cells:
+    a snake through the rows, scrambled by num_moves * rows * cols "backbite" moves.
+    '''
+    path = [(r, c if r % 2 == 0 else cols-1-c) for r in range(rows) for c in range(cols)]
+    for i in range(num_moves * rows * cols):
+        if rng.random() < 0.5:
+            path.reverse()
+        # join the last cell to a neighbor, then break the path right after that neighbor
+        r, c = path[-1]
+        neighbors = [(y, x) for y, x in ((r-1, c), (r+1, c), (r, c-1), (r, c+1))
+            if 0 <= y < rows and 0 <= x < cols and (y, x) != path[-2]]
+        if neighbors:
+            j = path.index(rng.choice(neighbors))
+            path = path[:j+1] + path[:j:-1]
+    return path
+
+def random_haisu(size, seed = 0, clue_probability = 0.5):
+    '''
+    Returns the JSON of a random size x size Haisu puzzle (with at least one solution):
+    a random Hamiltonian path through random regions, with some cells' visit numbers as clues.
+    '''
+    rng = random.Random(seed)
+    path = random_hamiltonian_path(size, size, rng)
+    borders = random_region_borders(size, size, max(1, size*size // 6), seed)
+    labels = utils.regions.label_regions(size, size, borders)
+    grid = {}
+    visits, previous_room = {}, None
+    for i, (r, c) in enumerate(path):
+        room = labels.get_region_id(r, c)
+        if room != previous_room:
+            visits[room] = visits.get(room, 0) + 1
+            previous_room = room
+        if i == 0:
+            grid[f'{2*r+1},{2*c+1}'] = 'S'
+        elif i == len(path) - 1:
+            grid[f'{2*r+1},{2*c+1}'] = 'G'
+        elif rng.random() < clue_probability:
+            grid[f'{2*r+1},{2*c+1}'] = str(visits[room])
+    for r, c, direction in borders:
+        if direction == Direction.LEFT and c > 0:
+            grid[f'{2*r+1},{2*c}'] = 'black'
+        elif direction == Direction.TOP and r > 0:
+            grid[f'{2*r},{2*c+1}'] = 'black'
+    return json.dumps({'param_values': {'r': str(size), 'c': str(size)}, 'grid': grid,
+        'puzzle_type': 'haisu', 'properties': {'outside': '0000', 'border': True}})
+
+def run_haisu_benchmark(sizes = (6, 10, 14), seed = 0, clue_probability = 0.9):
+    '''
+    Solves a random Haisu puzzle of each size with each of haisu.py's
+    path order encodings. Returns the measurements of each (see run_case).
+
+    With the defaults, COUNTERS solves every puzzle within the time limit
+    (the 14x14 one in about 15 seconds) and PAIRWISE times out on the 14x14 one.
+    '''
+    haisu = solvers.get_solver('haisu')
+    order_encoding = haisu.ORDER_ENCODING
+    results = {}
+    try:
+        for size in sizes:
+            puzzle_json = random_haisu(size, seed, clue_probability)
+            for encoding in (haisu.COUNTERS, haisu.PAIRWISE):
+                print(f'benchmarking haisu {size}x{size} ({encoding})', flush = True)
+                haisu.ORDER_ENCODING = encoding
+                try:
+                    result = run_case('haisu', puzzle_json, STRESS_TIMEOUT_SECONDS)
+                except Exception as exc:
+                    result = {'error': str(exc)}
+                results[f'{size}x{size}/{encoding}'] = result
+    finally:
+        haisu.ORDER_ENCODING = order_encoding
+    return results
+
+def get_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(old, new, threshold):
+    '''
+    Prints how each case changed between two benchmark outputs.
+    Returns the number of regressions: cases that got slower by more than
+    `threshold` (a ratio), that got bigger (in total, or in what any one
+    constraint builder creates), or whose # solutions changed.
+    '''
+    regressions = 0
+    print(f'{"case":<32}{"old total":>12}{"new total":>12}{"ratio":>8}  changes')
+    for case_name in sorted(set(old['results']) | set(new['results'])):
+        old_result, new_result = old['results'].get(case_name), new['results'].get(case_name)
+        if old_result is None or new_result is None:
+            print(f'{case_name:<32}{"(only in " + ("new" if old_result is None else "old") + ")":>32}')
+            continue
+        if 'error' in old_result or 'error' in new_result:
+            print(f'{case_name:<32}  error: {new_result.get("error", "fixed")}')
+            regressions += 'error' in new_result
+            continue
+        changes = []
+        ratio = new_result['total'] / max(old_result['total'], 1e-9)
+        if ratio > threshold:
+            changes.append('slower')
+        for key in ('num_vars', 'num_rules'):
+            if new_result[key] != old_result[key]:
+                changes.append(f'{key} {old_result[key]} -> {new_result[key]}')
+        if new_result['num_solutions'] != old_result['num_solutions']:
+            changes.append(f'num_solutions {old_result["num_solutions"]} -> {new_result["num_solutions"]}')
+        grown_builders = []
+        old_builders, new_builders = old_result.get('builders', {}), new_result.get('builders', {})
+        for name in new_builders:
+            if name in old_builders:
+                for key in ('vars', 'rules'):
+                    if new_builders[name][key] > old_builders[name][key]:
+                        grown_builders.append(f'{name} {key} {old_builders[name][key]} -> {new_builders[name][key]}')
+        changes += grown_builders
+        regressions += ratio > threshold or new_result['num_vars'] > old_result['num_vars'] or \
+            new_result['num_rules'] > old_result['num_rules'] or bool(grown_builders) or \
+            new_result['num_solutions'] != old_result['num_solutions']
+        print(f'{case_name:<32}{old_result["total"]:>12.4f}{new_result["total"]:>12.4f}{ratio:>8.2f}  {", ".join(changes)}')
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Benchmark the solvers.')
+    parser.add_argument('puzzle_names', help = 'The "names" ("IDs") of puzzles to benchmark (default: all).', nargs = '*', type = str)
+    parser.add_argument('-o', '--output', help = 'Write the results to this JSON file.')
+    parser.add_argument('-r', '--repeat', help = 'Run each case this many times, keeping the fastest.', type = int, default = 1)
+    parser.add_argument('-s', '--stress', help = 'Also run enlarged versions of the test cases.', action = 'store_true')
+    parser.add_argument('-c', '--compare', help = 'Compare the results to an earlier output file; exit with 1 on regressions.')
+    parser.add_argument('-t', '--threshold', help = 'The slowdown ratio that counts as a regression (default: 1.25).', type = float, default = 1.25)
+    parser.add_argument('--regions', help = 'Also time full_bfs on random 50x50 region layouts.', action = 'store_true')
+    parser.add_argument('--haisu', help = 'Also solve random Haisu puzzles of up to 14x14 with each path order encoding.', action = 'store_true')
+    parser.add_argument('--diff', help = 'Just compare two earlier output files.', nargs = 2, metavar = ('OLD', 'NEW'))
+    args = parser.parse_args()
+
+    if args.diff:
+        with open(args.diff[0]) as old_file, open(args.diff[1]) as new_file:
+            sys.exit(1 if compare(json.load(old_file), json.load(new_file), args.threshold) else 0)
+
+    cases = get_cases(args.puzzle_names or all_test_cases, args.stress)
+    benchmark = {
+        'revision': get_revision(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': run_benchmark(cases, args.repeat),
+    }
+    if args.regions:
+        benchmark['regions'] = run_region_benchmark()
+    if args.haisu:
+        benchmark['haisu'] = run_haisu_benchmark()
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(benchmark, output_file, indent = 2)
+    else:
+        print(json.dumps(benchmark, indent = 2))
+
+    if args.compare:
+        with open(args.compare) as old_file:
+            sys.exit(1 if compare(json.load(old_file), benchmark, args.threshold) else 0)
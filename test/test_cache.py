@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+import unittest
+
+from noq.cache import SolutionCache, canonical_key
+from solvers import akari, lits
+from solvers.utils.solutions import ALL_SOLUTIONS, MAX_SOLUTIONS_TO_FIND, UNIQUENESS_CHECK
+
+AKARI = {'param_values': {'r': '4', 'c': '4'}, 'grid': {'1,1': 'black', '3,5': '1', '7,7': '2'},
+    'puzzle_type': 'akari', 'properties': {'outside': '0000', 'border': False}}
+LITS = {'param_values': {'r': '3', 'c': '3'}, 'grid': {'2,1': 'black', '2,3': 'black', '3,4': 'black', '5,4': 'black'},
+    'puzzle_type': 'lits', 'properties': {'outside': '0000', 'border': True}}
+
+def puzzle(base, grid = None, **changes):
+    '''
+    Returns the JSON string of a copy of a puzzle, with some of its fields changed.
+    '''
+    puzzle = dict(base, **changes)
+    if grid is not None:
+        puzzle['grid'] = grid
+    return json.dumps(puzzle)
+
+class CanonicalKeyTest(unittest.TestCase):
+    def test_equivalent_inputs(self):
+        key = canonical_key('akari', akari.encode(puzzle(AKARI)))
+        # grid key order, properties and puzzle_type don't matter
+        reordered = dict(reversed(list(AKARI['grid'].items())))
+        self.assertEqual(key, canonical_key('akari', akari.encode(puzzle(AKARI, reordered))))
+        self.assertEqual(key, canonical_key('akari', akari.encode(puzzle(AKARI,
+            properties = {'outside': '0000', 'border': True}, puzzle_type = 'other'))))
+        # neither does the order of the borders
+        borders = dict(reversed(list(LITS['grid'].items())))
+        self.assertEqual(canonical_key('lits', lits.encode(puzzle(LITS))),
+            canonical_key('lits', lits.encode(puzzle(LITS, borders))))
+
+    def test_different_inputs(self):
+        key = canonical_key('akari', akari.encode(puzzle(AKARI)))
+        self.assertNotEqual(key, canonical_key('akari', akari.encode(puzzle(AKARI, dict(AKARI['grid'], **{'7,7': '3'})))))
+        self.assertNotEqual(key, canonical_key('akari', akari.encode(puzzle(AKARI, param_values = {'r': '4', 'c': '5'}))))
+        self.assertNotEqual(key, canonical_key('lightup', akari.encode(puzzle(AKARI))))
+
+    def test_solve_options(self):
+        E = akari.encode(puzzle(AKARI))
+        key = canonical_key('akari', E)
+        self.assertEqual(key, canonical_key('akari', E, ALL_SOLUTIONS, MAX_SOLUTIONS_TO_FIND))
+        unique_key = canonical_key('akari', E, UNIQUENESS_CHECK)
+        limited_key = canonical_key('akari', E, ALL_SOLUTIONS, 3)
+        self.assertEqual(len({key, unique_key, limited_key}), 3)
+
+class SolutionCacheTest(unittest.TestCase):
+    def test_memory_eviction(self):
+        value = [{'1,1': 'black'}]
+        size = len(json.dumps(value))
+        cache = SolutionCache(max_bytes = 2*size)
+        cache.put('a', value)
+        cache.put('b', value)
+        self.assertEqual(cache.get('a'), value) # now 'b' is the least recently used
+        cache.put('c', value)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), value)
+        self.assertEqual(cache.get('c'), value)
+        stats = cache.stats()
+        self.assertEqual((stats['memory_hits'], stats['misses']), (3, 1))
+        self.assertEqual((stats['memory_entries'], stats['memory_bytes']), (2, 2*size))
+
+    def test_disk_tier(self):
+        value = [{'1,1': 'black'}, {'1,1': 'white'}]
+        size = len(json.dumps(value))
+        with tempfile.TemporaryDirectory() as directory:
+            db_path = os.path.join(directory, 'cache.sqlite3')
+            writer = SolutionCache(0, db_path, db_max_bytes = 2*size)
+            writer.put('a', value)
+            writer.put('b', value)
+            # another process, or a restart, sees the same entries
+            reader = SolutionCache(0, db_path, db_max_bytes = 2*size)
+            self.assertEqual(reader.get('a'), value)
+            self.assertEqual(reader.stats()['disk_hits'], 1)
+            # 'b' is the least recently used entry, so it's the one that makes room
+            reader.put('c', value)
+            self.assertIsNone(SolutionCache(0, db_path, 2*size).get('b'))
+            self.assertEqual(SolutionCache(0, db_path, 2*size).get('c'), value)
+
+    def test_lookup(self):
+        E = akari.encode(puzzle(AKARI))
+        cache = SolutionCache(2**20)
+        key, solutions = cache.lookup('akari', E)
+        self.assertIsNone(solutions)
+        cache.put(key, [{'1,1': 'black'}])
+        self.assertEqual(cache.lookup('akari', E), (key, [{'1,1': 'black'}]))
+        # solutions found in another mode aren't reused
+        self.assertIsNone(cache.lookup('akari', E, mode = UNIQUENESS_CHECK)[1])
+        self.assertIsNone(cache.lookup('akari', E, max_solutions = 1)[1])
+
+if __name__ == '__main__':
+    unittest.main()
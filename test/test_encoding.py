@@ -0,0 +1,98 @@
+import json
+import random
+import unittest
+
+from noq.cache import canonical_key
+from solvers import utils
+from solvers.utils.borders import BorderPlanes, Direction, get_edge_id
+from solvers.utils.encoding import Encoding, PackedEncoding
+from test.test import all_test_cases
+
+def all_edge_ids(rows, cols):
+    '''
+    Returns every (r, c, direction) with r, c one past the grid on each side,
+    including the non-canonical and off-grid ones.
+    '''
+    return [(r, c, d) for r in range(-1, rows+1) for c in range(-1, cols+1) for d in Direction]
+
+def random_edge_ids(rows, cols, seed):
+    '''
+    Returns a set of canonical edge ids (see get_edge_id): the grid's outline
+    and about half of the lines inside it.
+    '''
+    rng = random.Random(seed)
+    edge_ids = set()
+    for r in range(rows):
+        for c in range(cols):
+            on_outline = {Direction.LEFT: c == 0, Direction.TOP: r == 0,
+                Direction.RIGHT: c == cols-1, Direction.BOTTOM: r == rows-1}
+            for d in Direction:
+                if on_outline[d] or rng.random() < 0.5:
+                    edge_ids.add(get_edge_id(rows, cols, r, c, d))
+    return edge_ids
+
+class BorderPlanesTest(unittest.TestCase):
+    def test_same_as_set(self):
+        for rows, cols, seed in ((1, 1, 0), (3, 5, 1), (6, 6, 2), (7, 4, 3)):
+            edge_ids = random_edge_ids(rows, cols, seed)
+            planes = BorderPlanes(rows, cols, edge_ids)
+            with self.subTest(rows = rows, cols = cols):
+                self.assertEqual(len(planes), len(edge_ids))
+                self.assertEqual(sorted(planes, key = str), sorted(edge_ids, key = str))
+                self.assertEqual(planes, edge_ids)
+                for edge_id in all_edge_ids(rows, cols):
+                    self.assertEqual(edge_id in planes, edge_id in edge_ids, edge_id)
+
+    def test_boundary_edges(self):
+        planes = BorderPlanes(2, 3)
+        # non-canonical ids are added as the canonical id of the same edge...
+        planes.add((1, 1, Direction.BOTTOM))
+        planes.add((0, 1, Direction.RIGHT))
+        self.assertEqual(set(planes), {(1, 1, Direction.BOTTOM), (0, 2, Direction.LEFT)})
+        # ...but only the canonical id is a member, as in a set of edge ids
+        self.assertIn((0, 2, Direction.LEFT), planes)
+        self.assertNotIn((0, 1, Direction.RIGHT), planes)
+        # and edges of cells outside the grid are neither added nor members
+        planes.add((2, 1, Direction.TOP))
+        planes.add((0, 3, Direction.LEFT))
+        self.assertNotIn((2, 1, Direction.TOP), planes)
+        self.assertNotIn((0, 3, Direction.LEFT), planes)
+        self.assertEqual(len(planes), 2)
+        planes.discard((0, 1, Direction.RIGHT))
+        self.assertEqual(set(planes), {(1, 1, Direction.BOTTOM)})
+
+class PackedEncodingTest(unittest.TestCase):
+    def test_same_as_encoding(self):
+        '''
+        Every bordered test case encodes to the same puzzle either way.
+        '''
+        for puzzle_type, test_cases in all_test_cases.items():
+            for expected_num_solutions, puzzle_json in test_cases:
+                properties = json.loads(puzzle_json)['properties']
+                if not properties['border']:
+                    continue
+                with self.subTest(puzzle_type = puzzle_type):
+                    E = utils.encode(puzzle_json, has_borders = True, outside_clues = properties['outside'])
+                    P = utils.encode(puzzle_json, has_borders = True, outside_clues = properties['outside'], packed = True)
+                    self.assertIsInstance(E, Encoding)
+                    self.assertIsInstance(P, PackedEncoding)
+                    self.assertEqual((P.R, P.C, P.params), (E.R, E.C, E.params))
+                    self.assertEqual(P.clues, E.clues)
+                    self.assertEqual(P.edges, E.edges)
+                    self.assertEqual((P.top, P.right, P.bottom, P.left), (E.top, E.right, E.bottom, E.left))
+                    for r in range(E.R):
+                        for c in range(E.C):
+                            self.assertEqual(P.get_clue(r, c), E.clues.get((r, c)))
+                    self.assertEqual(canonical_key(puzzle_type, P), canonical_key(puzzle_type, E))
+
+    def test_clue_representations(self):
+        P = PackedEncoding(2, 2, {(0, 1): 3})
+        self.assertEqual(P.cells, [None, 3, None, None])
+        P.cells = [1, None, None, 'black']
+        self.assertEqual(P.clues, {(0, 0): 1, (1, 1): 'black'})
+        P.clue_cells = {(1, 0): 2}
+        self.assertEqual(P.cells, [None, None, 2, None])
+        self.assertEqual(P.get_clue(1, 0), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import json
+import random
+import unittest
+
+from solvers import utils
+from solvers.utils.borders import BorderPlanes, Direction, get_edge_id
+from solvers.utils.regions import full_bfs, label_regions
+from test.test import all_test_cases
+
+OFFSETS = {Direction.LEFT: (0, -1), Direction.TOP: (-1, 0), Direction.RIGHT: (0, 1), Direction.BOTTOM: (1, 0)}
+
+def bfs_regions(rows, cols, borders, clues = None):
+    '''
+    The breadth-first search that full_bfs used before label_regions:
+    returns the same thing as full_bfs, from a search over sets of cells.
+    '''
+    unexplored = {(r, c) for r in range(rows) for c in range(cols)}
+    room_of = {}
+    while unexplored:
+        start = min(unexplored)
+        unexplored.remove(start)
+        room, frontier = {start}, [start]
+        while frontier:
+            r, c = frontier.pop()
+            for d, (dr, dc) in OFFSETS.items():
+                neighbor = (r+dr, c+dc)
+                if neighbor in unexplored and get_edge_id(rows, cols, r, c, d) not in borders:
+                    unexplored.remove(neighbor)
+                    room.add(neighbor)
+                    frontier.append(neighbor)
+        room = frozenset(room)
+        for cell in room:
+            room_of[cell] = room
+    for r, c, d in borders:
+        dr, dc = OFFSETS[d]
+        if room_of.get((r+dr, c+dc)) is room_of[(r, c)]:
+            raise ValueError('There is a dead-end edge.')
+    if clues:
+        clue_to_room = {}
+        for cell in sorted(clues):
+            if not any(room_of[cell] is room for room in clue_to_room.values()):
+                clue_to_room[cell] = room_of[cell]
+        return clue_to_room
+    return set(room_of.values())
+
+def random_borders(rows, cols, num_labels, seed):
+    '''
+    Returns the edge ids of a grid whose cells get random labels,
+    with a border between every two cells with different labels.
+    '''
+    rng = random.Random(seed)
+    labels = [[rng.randrange(num_labels) for c in range(cols)] for r in range(rows)]
+    return borders_between(labels)
+
+def borders_between(labels):
+    '''
+    Returns the edge ids of a grid with a border around it,
+    and between every two cells that have different labels.
+    '''
+    rows, cols = len(labels), len(labels[0])
+    edge_ids = set()
+    for r in range(rows):
+        for c in range(cols):
+            for d, (dr, dc) in OFFSETS.items():
+                r2, c2 = r+dr, c+dc
+                if not (0 <= r2 < rows and 0 <= c2 < cols) or labels[r2][c2] != labels[r][c]:
+                    edge_ids.add(get_edge_id(rows, cols, r, c, d))
+    return edge_ids
+
+class LabelRegionsTest(unittest.TestCase):
+    def assert_same_regions(self, rows, cols, edge_ids, clues = None):
+        expected = bfs_regions(rows, cols, edge_ids, clues)
+        for borders in (edge_ids, BorderPlanes(rows, cols, edge_ids)):
+            self.assertEqual(full_bfs(rows, cols, borders, clues), expected)
+            if not clues:
+                labels = label_regions(rows, cols, borders)
+                self.assertEqual(labels.regions(), expected)
+                self.assertEqual(len(labels), len(expected))
+                for r in range(rows):
+                    for c in range(cols):
+                        self.assertIn((r, c), labels.region_of(r, c))
+
+    def test_test_cases(self):
+        for puzzle_type, test_cases in all_test_cases.items():
+            for expected_num_solutions, puzzle_json in test_cases:
+                properties = json.loads(puzzle_json)['properties']
+                if not properties['border']:
+                    continue
+                E = utils.encode(puzzle_json, has_borders = True, outside_clues = properties['outside'])
+                with self.subTest(puzzle_type = puzzle_type):
+                    self.assert_same_regions(E.R, E.C, E.edges)
+                    self.assert_same_regions(E.R, E.C, E.edges, E.clues)
+
+    def test_random_regions(self):
+        for rows, cols, num_labels, seed in ((1, 1, 1, 0), (1, 8, 2, 1), (5, 5, 2, 2), (8, 6, 3, 3), (12, 12, 4, 4)):
+            with self.subTest(rows = rows, cols = cols, seed = seed):
+                edge_ids = random_borders(rows, cols, num_labels, seed)
+                self.assert_same_regions(rows, cols, edge_ids)
+                clues = {(r, c): 1 for r in range(0, rows, 2) for c in range(0, cols, 3)}
+                self.assert_same_regions(rows, cols, edge_ids, clues)
+
+    def test_boundary_regions(self):
+        # an L along the bottom and right edges, a room in the bottom-right corner,
+        # and a room that only touches the right edge
+        labels = [[0, 0, 0, 1],
+                  [0, 2, 2, 1],
+                  [0, 2, 3, 3],
+                  [1, 1, 1, 4]]
+        edge_ids = borders_between(labels)
+        self.assert_same_regions(4, 4, edge_ids)
+        regions = label_regions(4, 4, edge_ids)
+        self.assertEqual(regions.region_of(3, 3), frozenset({(3, 3)}))
+        self.assertEqual(regions.region_of(2, 3), frozenset({(2, 2), (2, 3)}))
+        self.assertEqual(regions.region_of(0, 3), frozenset({(0, 3), (1, 3)}))
+        self.assertEqual(regions.region_of(3, 0), frozenset({(3, 0), (3, 1), (3, 2)}))
+
+    def test_dead_end_edges(self):
+        # a border inside the 2x2 room (that doesn't split it) has it on both sides
+        labels = [[0, 1, 1],
+                  [2, 1, 1],
+                  [2, 2, 2]]
+        for dead_end in ((0, 2, Direction.LEFT), (1, 2, Direction.TOP), (1, 1, Direction.TOP)):
+            edge_ids = borders_between(labels) | {dead_end}
+            for borders in (edge_ids, BorderPlanes(3, 3, edge_ids)):
+                with self.subTest(dead_end = dead_end, borders = type(borders).__name__):
+                    self.assertRaises(ValueError, bfs_regions, 3, 3, borders)
+                    self.assertRaises(ValueError, label_regions, 3, 3, borders)
+
+if __name__ == '__main__':
+    unittest.main()
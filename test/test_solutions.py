@@ -0,0 +1,47 @@
+import unittest
+from unittest import mock
+
+from solvers.claspy import *
+from solvers import aquapelago, numberlink
+from solvers.utils import solutions
+from solvers.utils.grids import RectangularGrid
+from test.test import all_test_cases
+
+class GetAtomsTest(unittest.TestCase):
+    def setUp(self):
+        reset()
+
+    def test_grid(self):
+        grid = RectangularGrid(2, 2, lambda r, c: MultiVar('a', 'b') if r else BoolVar())
+        expected = set()
+        for row in grid:
+            expected |= solutions.get_atoms(list(row))
+        self.assertEqual(solutions.get_atoms(grid), expected)
+        self.assertEqual(len(expected), 2 + 2*2)
+
+    def test_not_variables(self):
+        self.assertIsNone(solutions.get_atoms([BoolVar(), 'black']))
+        self.assertIsNone(solutions.get_atoms({(0, 0): BoolVar()}))
+
+class NativeEnumerationTest(unittest.TestCase):
+    def test_single_clasp_run(self):
+        '''
+        Puzzles with several solutions, whose solvers pass a RectangularGrid
+        as the projection (a loop solver's, and a shading solver's),
+        are solved with a single run of clasp.
+        '''
+        for module, (expected_num_solutions, puzzle_json) in ((numberlink, all_test_cases['numberlink'][1]),
+                (aquapelago, all_test_cases['aquapelago'][2])):
+            with self.subTest(module = module.__name__):
+                reset()
+                solutions.set_solve_options()
+                with mock.patch.object(solutions, 'claspy_solve_all', wraps = solutions.claspy_solve_all) as solve_all, \
+                        mock.patch.object(solutions, 'claspy_solve_until_stopped') as solve_until_stopped:
+                    found = module.solve(module.encode(puzzle_json))
+                self.assertGreater(expected_num_solutions, 1)
+                self.assertEqual(len(found), expected_num_solutions)
+                self.assertEqual(solve_all.call_count, 1)
+                solve_until_stopped.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import json
+import unittest
+
+from noq.cache import canonical_key
+from solvers import countryroad, heyawake, lits, masyu, nurikabe, tapa, yajilin
+from solvers.utils.encoding import parse_coord
+from solvers.utils.symmetry import ALL_SYMMETRIES, transform_dimensions, transform_point
+from test.test import all_test_cases
+
+def transform_puzzle(puzzle_json, symmetry, genre_symmetry):
+    '''
+    Returns the JSON string of a puzzle (without outside clues) after the symmetry
+    is applied, as the browser would send it if the puzzle was entered that way.
+    '''
+    puzzle = json.loads(puzzle_json)
+    params = puzzle['param_values']
+    rows, cols = int(params['r']), int(params['c'])
+    params['r'], params['c'] = map(str, transform_dimensions(symmetry, rows, cols))
+    grid = {}
+    for coord_str, value in puzzle['grid'].items():
+        i, j = transform_point(symmetry, 2*rows, 2*cols, *parse_coord(coord_str))
+        grid[f'{i},{j}'] = genre_symmetry.clue_map(value, symmetry)
+    puzzle['grid'] = grid
+    return json.dumps(puzzle)
+
+class TransformEncodingTest(unittest.TestCase):
+    def test_round_trip(self):
+        '''
+        Transforming a puzzle's Encoding gives the same cache key
+        as encoding the transformed puzzle.
+        '''
+        # bordered (lits, heyawake), loop (masyu), bordered loop (countryroad),
+        # and arrow (yajilin) genres, and genres with neither
+        for module in (lits, heyawake, masyu, countryroad, yajilin, nurikabe, tapa):
+            puzzle_type = module.__name__.split('.')[-1]
+            genre_symmetry = module.SYMMETRY
+            for expected_num_solutions, puzzle_json in all_test_cases[puzzle_type]:
+                E = module.encode(puzzle_json)
+                for symmetry in genre_symmetry.symmetries:
+                    with self.subTest(puzzle_type = puzzle_type, symmetry = symmetry):
+                        transformed = genre_symmetry.transform_encoding(E, symmetry)
+                        encoded = module.encode(transform_puzzle(puzzle_json, symmetry, genre_symmetry))
+                        self.assertEqual(canonical_key(puzzle_type, transformed), canonical_key(puzzle_type, encoded))
+
+    def test_boundary_edges(self):
+        # a rotation moves the left / top edges of the grid onto its right / bottom edges
+        E = lits.encode(all_test_cases['lits'][0][1])
+        for symmetry in ALL_SYMMETRIES:
+            transformed = lits.SYMMETRY.transform_encoding(E, symmetry)
+            for r, c, d in transformed.edges:
+                self.assertTrue(0 <= r < transformed.R and 0 <= c < transformed.C, (symmetry, (r, c, d)))
+            self.assertEqual(len(transformed.edges), len(E.edges), symmetry)
+
+if __name__ == '__main__':
+    unittest.main()